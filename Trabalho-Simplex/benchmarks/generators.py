@@ -0,0 +1,82 @@
+import numpy as np
+import scipy.sparse
+
+
+# max c.x, A x <= b with positive data: feasible at x = 0 and bounded
+def random_dense(num_rest, num_var, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix_problem = np.zeros([num_rest + 1, num_var + 2])
+    matrix_problem[0, 1:-1] = rng.uniform(1, 10, num_var)
+    matrix_problem[1:, 0] = 1
+    matrix_problem[1:, 1:-1] = rng.uniform(1, 10, [num_rest, num_var])
+    matrix_problem[1:, -1] = rng.uniform(10, 100, num_rest) * num_var
+    return matrix_problem
+
+
+# same family as random_dense with a fraction density of nonzero
+# coefficients (one per column at least, so nothing is unbounded), as CSR
+def random_sparse(num_rest, num_var, density=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = scipy.sparse.random(num_rest, num_var, density=density, random_state=rng, format='lil',
+                                 data_rvs=lambda size: rng.uniform(1, 10, size))
+    matrix[rng.integers(0, num_rest, num_var), np.arange(num_var)] = rng.uniform(1, 10, num_var)
+    objective = np.concatenate([[0], rng.uniform(1, 10, num_var), [0]])
+    body = scipy.sparse.hstack([np.ones([num_rest, 1]), matrix, rng.uniform(10, 100, [num_rest, 1]) * num_var])
+    return scipy.sparse.vstack([objective[None, :], body]).tocsr()
+
+
+# Dantzig's rule visits all 2^n vertices of this cube
+def klee_minty(size):
+    matrix_problem = np.zeros([size + 1, size + 2])
+    matrix_problem[0, 1:-1] = 2.0 ** np.arange(size - 1, -1, -1)
+    matrix_problem[1:, 0] = 1
+    for i in range(size):
+        matrix_problem[i + 1, 1:i + 1] = 2.0 ** np.arange(i + 1, 1, -1)
+        matrix_problem[i + 1, i + 1] = 1
+        matrix_problem[i + 1, -1] = 5.0 ** (i + 1)
+    return matrix_problem
+
+
+# most right-hand sides are zero, so most pivots are degenerate
+def degenerate(num_rest, num_var, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix_problem = np.zeros([num_rest + 1, num_var + 2])
+    matrix_problem[0, 1:-1] = rng.integers(1, 20, num_var)
+    matrix_problem[1:, 0] = 1
+    matrix_problem[1:, 1:-1] = rng.integers(-5, 10, [num_rest, num_var])
+    matrix_problem[1:, -1] = np.where(rng.random(num_rest) < 0.7, 0, rng.integers(1, 50, num_rest))
+    matrix_problem[1, 1:-1] = 1
+    matrix_problem[1, -1] = 100
+    return matrix_problem
+
+
+# mixed <=, >= and = lines built around a known feasible point, so both
+# Big-M and two-phase need their artificials; a last line keeps it bounded
+def artificial(num_rest, num_var, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 5, num_var)
+    matrix = rng.uniform(0, 10, [num_rest, num_var])
+    kinds = rng.choice([1, 2, 3], num_rest, p=[0.4, 0.4, 0.2])
+    b = matrix @ x
+    slack = rng.uniform(0, 5, num_rest)
+    b = np.where(kinds == 1, b + slack, np.where(kinds == 2, np.maximum(b - slack, 0), b))
+    matrix_problem = np.zeros([num_rest + 2, num_var + 2])
+    matrix_problem[0, 1:-1] = rng.uniform(-5, 10, num_var)
+    matrix_problem[1:-1, 0] = kinds
+    matrix_problem[1:-1, 1:-1] = matrix
+    matrix_problem[1:-1, -1] = b
+    matrix_problem[-1] = np.concatenate([[1], np.ones(num_var), [100 * num_var]])
+    return matrix_problem
+
+
+# as many equality lines as variables around a positive point, so the
+# optimal basis has no nonbasic structural or slack column
+def square_equality(size, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.uniform(1, 10, [size, size]) + size * np.eye(size)
+    matrix_problem = np.zeros([size + 1, size + 2])
+    matrix_problem[0, 1:-1] = rng.uniform(1, 10, size)
+    matrix_problem[1:, 0] = 3
+    matrix_problem[1:, 1:-1] = matrix
+    matrix_problem[1:, -1] = matrix @ rng.uniform(1, 5, size)
+    return matrix_problem
@@ -0,0 +1,69 @@
+import argparse
+import time
+
+import numpy as np
+
+import simplex as sp
+
+
+def random_tableau(num_rest, num_var, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = np.zeros([num_rest + 1, num_var + num_rest + 1])
+    matrix[0, :num_var] = -rng.uniform(1, 10, num_var)
+    matrix[1:, :num_var] = rng.uniform(1, 10, [num_rest, num_var])
+    matrix[1:, num_var:-1] = np.eye(num_rest)
+    matrix[1:, -1] = rng.uniform(10, 100, num_rest) * num_var
+    return matrix
+
+
+def legacy_pivot(matrix, pivot_line_index, pivot_column_index) -> None:
+    matrix[pivot_line_index] /= matrix[pivot_line_index][pivot_column_index]
+    new_pivot_line = matrix[pivot_line_index]
+    for i, line in enumerate(matrix):
+        if i == pivot_line_index:
+            continue
+        matrix[i] = (-line[pivot_column_index] * new_pivot_line) + line
+
+
+def run(matrix, pivot, kernel, iterations) -> int:
+    pricing = sp.DantzigPricing()
+    done = 0
+    while done < iterations:
+        pivot_column_index = pricing.select(kernel.reduced_costs(matrix, False))
+        if pivot_column_index < 0:
+            break
+        pivot_line_index = kernel.pivot_line(matrix, pivot_column_index)
+        if pivot_line_index < 0:
+            break
+        pivot(matrix, pivot_line_index, pivot_column_index)
+        done += 1
+    return done
+
+
+def measure(num_rest, num_var, iterations, legacy) -> float:
+    kernel = sp.PivotKernel()
+    matrix = random_tableau(num_rest, num_var)
+    pivot = legacy_pivot if legacy else kernel.pivot
+    start = time.perf_counter()
+    done = run(matrix, pivot, kernel, iterations)
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Iterations/sec of the tableau pivot kernel")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 200, 400, 800])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--legacy', action='store_true', help="also time the row-by-row update")
+    args = parser.parse_args()
+
+    print(f"{'m':>6} {'n':>6} {'kernel it/s':>14}" + (f" {'legacy it/s':>14}" if args.legacy else ""))
+    for size in args.sizes:
+        num_rest, num_var = size, size * 2
+        line = f"{num_rest:>6} {num_var:>6} {measure(num_rest, num_var, args.iterations, False):>14.1f}"
+        if args.legacy:
+            line += f" {measure(num_rest, num_var, args.iterations, True):>14.1f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
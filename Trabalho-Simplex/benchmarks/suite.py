@@ -0,0 +1,192 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import simplex as sp
+from benchmarks import generators
+
+# name -> (generator, arguments, Simplex options)
+CASES = {
+    'dense_100x200': (generators.random_dense, (100, 200), {}),
+    'dense_100x200_revised': (generators.random_dense, (100, 200), {'engine': 'revised'}),
+    'sparse_300x600_revised': (generators.random_sparse, (300, 600, 0.02), {'engine': 'revised'}),
+    'klee_minty_8': (generators.klee_minty, (8,), {}),
+    'klee_minty_8_steepest_edge': (generators.klee_minty, (8,), {'pricing': 'steepest_edge'}),
+    'degenerate_60x40': (generators.degenerate, (60, 40), {}),
+    'artificial_60x40_big_m': (generators.artificial, (60, 40), {}),
+    'artificial_60x40_two_phase': (generators.artificial, (60, 40), {'method': 'two_phase'}),
+}
+
+# models that once broke a solver path, as (matrix_problem, expected status,
+# extra options): each must reach that status on every engine and method,
+# and optimal ones without presolve must run sensitivity analysis
+CHECKS = {
+    'square_equality_small': (np.array([[0, 1, 1, 0], [3, 1, 1, 2], [3, 1, -1, 0], [1, 1, 0, 5]], dtype=float),
+                              sp.OPTIMAL, {}),
+    'square_equality_20': (generators.square_equality(20), sp.OPTIMAL, {}),
+    'presolve_negative_b': (np.array([[0, 2, 4, -3, 0], [3, 0, 0, 6, 16], [1, 6, 7, 5, 11]], dtype=float),
+                            sp.INFEASIBLE, {'presolve': True}),
+    'presolve_infeasible_no_columns': (np.array([[0, 3, 0], [2, 0, 8], [1, 5, 21], [3, 2, 4], [3, 4, 9], [3, 7, 29]],
+                                                dtype=float), sp.INFEASIBLE, {'presolve': True}),
+}
+CHECK_OPTIONS = [{}, {'method': 'two_phase'}, {'engine': 'revised'}, {'engine': 'revised', 'method': 'two_phase'}]
+
+# a case regresses when time, peak memory or iterations grow past
+# baseline * (1 + threshold) and by more than the noise floor of the
+# measure (seconds, bytes, iterations)
+NOISE_FLOOR = {'time': 1e-3, 'peak_memory': 2 ** 16, 'iterations': 0}
+
+
+def solve(matrix_problem, options):
+    simplex = sp.Simplex(matrix_problem, history='none', **options)
+    simplex.execute()
+    return simplex
+
+
+# wall time is the best of repeats; peak memory comes from a separate run
+# since tracemalloc slows the solve down
+def measure_case(generator, arguments, options, repeats):
+    matrix_problem = generator(*arguments)
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        simplex = solve(matrix_problem, options)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    solve(matrix_problem, options)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'status': simplex.status,
+        'time': best,
+        'iterations': simplex.iterations,
+        'iterations_per_second': simplex.iterations / best if best > 0 else 0.0,
+        'peak_memory': peak_memory,
+    }
+
+
+# total time spent in each tableau hot path along one Dantzig solve (the
+# best of repeats), with the per-call mean alongside
+def measure_hot_paths(repeats, num_rest=300, num_var=600, get_vb_calls=200):
+    results = {}
+    for _ in range(repeats):
+        for name, values in time_hot_paths(num_rest, num_var, get_vb_calls).items():
+            if name not in results or sum(values) < results[name]['time']:
+                results[name] = {'time': sum(values), 'calls': len(values), 'time_per_call': float(np.mean(values))}
+    return results
+
+
+def time_hot_paths(num_rest, num_var, get_vb_calls):
+    simplex = sp.Simplex(generators.random_dense(num_rest, num_var), history='none')
+    timings = {'define_pivot_line': [], 'generate_new_algorithm': [], 'get_vb': []}
+    while True:
+        matrix = simplex.get_algorithm()
+        pivot_column_index = simplex.pricing.select(simplex.kernel.reduced_costs(matrix, simplex.fo_min))
+        if pivot_column_index < 0:
+            break
+        start = time.perf_counter()
+        pivot_line_index = simplex.define_pivot_line(pivot_column_index, matrix)
+        timings['define_pivot_line'].append(time.perf_counter() - start)
+        if pivot_line_index < 0:
+            break
+        start = time.perf_counter()
+        simplex.generate_new_algorithm(pivot_line_index, pivot_column_index)
+        timings['generate_new_algorithm'].append(time.perf_counter() - start)
+    for _ in range(get_vb_calls):
+        start = time.perf_counter()
+        simplex.get_vb()
+        timings['get_vb'].append(time.perf_counter() - start)
+    return timings
+
+
+def run_checks() -> list:
+    failures = []
+    for name, (matrix_problem, status, extra) in CHECKS.items():
+        for options in CHECK_OPTIONS:
+            options = dict(options, **extra)
+            try:
+                simplex = solve(matrix_problem, options)
+                if simplex.status != status:
+                    raise Exception(f"status {simplex.status}")
+                if status == sp.OPTIMAL and not options.get('presolve'):
+                    simplex.sensitivity()
+            except Exception as error:
+                failures.append((name, options, error))
+    return failures
+
+
+def run(names, repeats):
+    results = {name: measure_case(*CASES[name], repeats) for name in names}
+    for name, result in measure_hot_paths(repeats).items():
+        results['hot_path.' + name] = result
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cases': results,
+    }
+
+
+def compare(results, baseline, threshold) -> list:
+    regressions = []
+    for name, result in results['cases'].items():
+        reference = baseline['cases'].get(name)
+        if reference is None:
+            continue
+        for key, floor in NOISE_FLOOR.items():
+            if key not in reference or key not in result or reference[key] <= 0:
+                continue
+            growth = result[key] - reference[key]
+            if growth > reference[key] * threshold and growth > floor:
+                regressions.append((name, key, reference[key], result[key]))
+    return regressions
+
+
+def report(results, baseline=None) -> None:
+    print(f"{'case':<36} {'status':<10} {'time (s)':>10} {'its':>6} {'it/s':>10} {'peak MB':>8} {'vs base':>8}")
+    for name, result in results['cases'].items():
+        reference = (baseline or {}).get('cases', {}).get(name)
+        ratio = f"{result['time'] / reference['time']:.2f}x" if reference and reference['time'] > 0 else ''
+        print(f"{name:<36} {result.get('status', ''):<10} {result['time']:>10.5f} {result.get('iterations', ''):>6} "
+              f"{result.get('iterations_per_second', 0):>10.1f} {result.get('peak_memory', 0) / 2 ** 20:>8.2f} "
+              f"{ratio:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solver benchmark suite with baseline comparison")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--save', metavar='BASELINE', help="write the results as the new baseline JSON")
+    parser.add_argument('--compare', metavar='BASELINE', help="fail when a case regresses against this baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative growth (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    failures = run_checks()
+    for name, options, error in failures:
+        print(f"CHECK FAILED {name} {options}: {error}")
+    if failures:
+        sys.exit(1)
+    results = run(args.cases, args.repeats)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, key, before, after in regressions:
+            print(f"REGRESSION {name} {key}: {before:.6g} -> {after:.6g}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
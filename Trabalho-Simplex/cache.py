@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse
+from scipy.linalg import LinAlgWarning
+
+import simplex as sp
+
+# statuses that depend only on the problem, not on a budget or a cancel
+CACHED_STATUS = (sp.OPTIMAL, sp.UNBOUNDED, sp.INFEASIBLE)
+# eviction goes down to this fraction of max_bytes, so the directory isn't
+# rescanned on every write once it is full
+EVICT_TARGET = 0.9
+
+
+# CSR parts (indptr, indices, data) without explicit zeros, built straight
+# from a dense array so hashing a large dense problem needs no scipy copy
+def canonical(matrix_problem):
+    if scipy.sparse.issparse(matrix_problem):
+        matrix_problem = scipy.sparse.csr_matrix(matrix_problem, dtype=float)
+        matrix_problem.sum_duplicates()
+        matrix_problem.eliminate_zeros()
+        return matrix_problem.indptr, matrix_problem.indices, matrix_problem.data
+    matrix_problem = np.asarray(matrix_problem, dtype=float)
+    nonzero = matrix_problem != 0
+    indptr = np.concatenate([[0], np.cumsum(np.count_nonzero(nonzero, axis=1))])
+    return indptr, np.nonzero(nonzero)[1], matrix_problem[nonzero]
+
+
+# a Pricing instance keys as its rule name ('dantzig' for DantzigPricing()),
+# or by its class for a custom rule
+def option_value(value):
+    if isinstance(value, sp.Pricing):
+        for name, rule in sp.PRICING_RULES.items():
+            if type(value) is rule:
+                return name
+        return f'{type(value).__module__}.{type(value).__qualname__}'
+    raise TypeError(f"Option value {value!r} can't be part of a cache key")
+
+
+def options_bytes(options) -> bytes:
+    return json.dumps(options, sort_keys=True, default=option_value).encode()
+
+
+# the same problem hashes the same whether it comes dense or sparse, with
+# explicit zeros or not; options are the Simplex keyword arguments
+def problem_key(matrix_problem, options) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(matrix_problem.shape, dtype=np.int64).tobytes())
+    for part in canonical(matrix_problem):
+        digest.update(np.ascontiguousarray(part, dtype=np.float64 if part.dtype.kind == 'f' else np.int64))
+    digest.update(options_bytes(options))
+    return digest.hexdigest()
+
+
+# problems sharing shape, line kinds and options can reuse each other's basis
+def structure_key(matrix_problem, options) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(matrix_problem.shape, dtype=np.int64).tobytes())
+    config = matrix_problem[:, [0]].toarray() if scipy.sparse.issparse(matrix_problem) else matrix_problem[:, 0]
+    digest.update(np.ascontiguousarray(config, dtype=float).ravel() + 0.0)
+    digest.update(options_bytes(options))
+    return digest.hexdigest()
+
+
+# Memoizes Simplex results. The memory tier keeps max_entries results and
+# bases in LRU order; with a directory, results and bases are also written
+# there as JSON files and the least recently used ones are deleted once the
+# directory holds more than max_bytes (tracked as files are written, the
+# directory is only scanned at construction and when over the limit). A miss whose structure matches an
+# earlier solve warm-starts from that basis (dual simplex, then primal); a
+# basis from a problem that isn't that close can cost more pivots than a
+# cold start, so a warm solve past warm_budget pivots per line gives up.
+class ResultCache:
+
+    def __init__(self, max_entries=128, directory=None, max_bytes=64 * 2 ** 20, warm_budget=0.5):
+        self.max_entries = max_entries
+        self.warm_budget = warm_budget
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.results = OrderedDict()
+        self.bases = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.warm_starts = 0
+        self.files = OrderedDict()
+        self.total_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.scan()
+
+    # result dict with status, z, vb, basis (variable names), iterations,
+    # presolve (its report, None without presolve) and cached (True when no
+    # solve ran)
+    def solve(self, matrix_problem, max_iterations=None, time_limit=None, **options) -> dict:
+        key = problem_key(matrix_problem, options)
+        result = self.get('results', key)
+        if result is not None:
+            self.hits += 1
+            return dict(result, cached=True)
+        self.misses += 1
+        structure = structure_key(matrix_problem, options)
+        basis = self.get('bases', structure) if not options.get('presolve') else None
+        simplex = None
+        if basis is not None:
+            simplex = self.warm_solve(matrix_problem, basis, max_iterations, time_limit, options)
+        if simplex is None:
+            simplex = sp.Simplex(matrix_problem, history='none', **options)
+            simplex.execute(max_iterations, time_limit)
+        else:
+            self.warm_starts += 1
+        result = OrderedDict([
+            ('status', simplex.status),
+            ('z', float(simplex.get_z())),
+            ('vb', {name: float(value) for name, value in simplex.get_vb().items()}),
+            ('basis', simplex.get_basic_names() if simplex.presolve is None else None),
+            ('iterations', simplex.iterations),
+            ('presolve', dict(simplex.presolve.get_report()) if simplex.presolve is not None else None),
+        ])
+        if simplex.status in CACHED_STATUS:
+            self.put('results', key, result)
+            if result['basis'] is not None:
+                self.put('bases', structure, result['basis'])
+        return dict(result, cached=False)
+
+    # None when the basis turns out singular or the solve ends anywhere but
+    # on an optimal point that satisfies the constraints, so the caller
+    # solves cold; only cold solves report the other statuses
+    def warm_solve(self, matrix_problem, basis, max_iterations, time_limit, options):
+        simplex = sp.Simplex(matrix_problem, history='none', **options)
+        budget = max(1, int(self.warm_budget * simplex.num_rest))
+        if max_iterations is not None and max_iterations <= budget:
+            budget = None
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', LinAlgWarning)
+                simplex.warm_execute(basis, max_iterations if budget is None else budget, time_limit)
+        except (np.linalg.LinAlgError, LinAlgWarning, RuntimeError):
+            return None
+        if simplex.status != sp.OPTIMAL or not satisfies(matrix_problem, simplex.get_vb()):
+            return None
+        return simplex
+
+    def get(self, tier, key):
+        memory = getattr(self, tier)
+        if key in memory:
+            memory.move_to_end(key)
+            return memory[key]
+        if self.directory is None:
+            return None
+        path = self.path(tier, key)
+        try:
+            with open(path) as file:
+                text = file.read()
+            value = json.loads(text)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self.track(path, len(text))
+        self.remember(memory, key, value)
+        return value
+
+    def put(self, tier, key, value) -> None:
+        self.remember(getattr(self, tier), key, value)
+        if self.directory is None:
+            return
+        # written whole then renamed, so other processes never read half a file
+        text = json.dumps(value)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(text)
+        path = self.path(tier, key)
+        os.replace(temporary, path)
+        # json.dumps escapes non-ASCII, so characters are bytes
+        self.track(path, len(text))
+        self.evict()
+
+    def remember(self, memory, key, value) -> None:
+        memory[key] = value
+        memory.move_to_end(key)
+        if len(memory) > self.max_entries:
+            memory.popitem(last=False)
+
+    def path(self, tier, key) -> str:
+        return os.path.join(self.directory, f'{tier}-{key}.json')
+
+    # file sizes by path, least recently used first by modification time
+    # (get touches the file); files other processes write to a shared
+    # directory are only seen here
+    def scan(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self.files = OrderedDict((path, size) for _, size, path in sorted(entries))
+        self.total_bytes = sum(self.files.values())
+
+    def track(self, path, size) -> None:
+        self.total_bytes += size - self.files.pop(path, 0)
+        self.files[path] = size
+
+    # rescans first, so the sizes of files other processes wrote count too
+    def evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        self.scan()
+        while self.files and self.total_bytes > EVICT_TARGET * self.max_bytes:
+            path, size = self.files.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total_bytes -= size
+
+    def clear(self) -> None:
+        self.results.clear()
+        self.bases.clear()
+        self.files.clear()
+        self.total_bytes = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.json'):
+                    os.remove(entry.path)
+
+
+# x >= 0 and every constraint line holds within FEASIBILITY_TOLERANCE
+# (relative to the size of b)
+def satisfies(matrix_problem, vb) -> bool:
+    problem = scipy.sparse.csr_matrix(matrix_problem, dtype=float)
+    x = np.zeros(problem.shape[1] - 2)
+    for name, value in vb.items():
+        if name.startswith('x') and not name.startswith('xf'):
+            x[int(name[1:])] = value
+    if np.any(x < -sp.FEASIBILITY_TOLERANCE):
+        return False
+    activity = problem[1:, 1:-1] @ x
+    kinds = problem[1:, [0]].toarray().ravel()
+    b = problem[1:, [-1]].toarray().ravel()
+    tolerance = sp.FEASIBILITY_TOLERANCE * (1 + np.abs(b))
+    return bool(np.all(np.where(kinds == 1, activity <= b + tolerance,
+                                np.where(kinds == 2, activity >= b - tolerance,
+                                         np.abs(activity - b) <= tolerance))))
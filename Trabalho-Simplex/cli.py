@@ -0,0 +1,217 @@
+import os
+
+# one BLAS thread per worker, the pool already uses every core
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(variable, '1')
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+
+import simplex as sp
+from cache import ResultCache
+from interior_point import InteriorPoint
+from profiler import Profiler
+
+# one result cache per worker process, shared through its directory
+caches = {}
+
+
+def read_lines(path):
+    if path == '-':
+        yield from sys.stdin
+        return
+    with open(path) as file:
+        if path.endswith('.json'):
+            yield file.read()
+        else:
+            yield from file
+
+
+def expand_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(('.json', '.jsonl')):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+# each line is a matrix_problem (list of lines) or {"id": ..., "matrix_problem": [...]}
+def read_problems(paths):
+    index = 0
+    for path in expand_paths(paths):
+        for line in read_lines(path):
+            line = line.strip()
+            if not line:
+                continue
+            problem = json.loads(line)
+            if isinstance(problem, dict):
+                yield index, problem.get('id', index), problem['matrix_problem']
+            else:
+                yield index, index, problem
+            index += 1
+
+
+def solve(index, problem_id, matrix_problem, options) -> dict:
+    start = time.perf_counter()
+    try:
+        if options['cache_dir'] is not None:
+            return solve_cached(index, problem_id, matrix_problem, options, start)
+        profiler = Profiler(options['profile']) if options['profile'] else None
+        if options['interior_point']:
+            solver = InteriorPoint(np.array(matrix_problem, dtype=float), engine=options['engine'],
+                                   pricing=options['pricing'], method=options['method'])
+            simplex = solver.simplex
+            if profiler is not None:
+                simplex.add_observer(profiler)
+        else:
+            solver = simplex = sp.Simplex(np.array(matrix_problem, dtype=float), engine=options['engine'],
+                                          history='none', pricing=options['pricing'], method=options['method'],
+                                          presolve=options['presolve'],
+                                          observers=[profiler] if profiler is not None else ())
+        status = solver.execute(options['max_iterations'], options['time_limit'])
+        result = {
+            'index': index,
+            'id': problem_id,
+            'status': status,
+            'z': float(simplex.get_z()),
+            'vb': {key: float(value) for key, value in simplex.get_vb().items()},
+            'iterations': simplex.iterations,
+            'time': time.perf_counter() - start,
+        }
+        if options['interior_point']:
+            result['interior_point_iterations'] = solver.iterations
+        if simplex.presolve is not None:
+            result['presolve'] = dict(simplex.presolve.get_report())
+        if profiler is not None:
+            result['profile'] = profiler.get_report()
+        return result
+    except Exception as error:
+        return {'index': index, 'id': problem_id, 'status': 'error', 'error': str(error),
+                'time': time.perf_counter() - start}
+
+
+def solve_cached(index, problem_id, matrix_problem, options, start) -> dict:
+    cache = caches.get(options['cache_dir'])
+    if cache is None:
+        cache = caches[options['cache_dir']] = ResultCache(directory=options['cache_dir'])
+    result = cache.solve(np.array(matrix_problem, dtype=float), options['max_iterations'], options['time_limit'],
+                         engine=options['engine'], pricing=options['pricing'], method=options['method'],
+                         presolve=options['presolve'])
+    solved = {
+        'index': index,
+        'id': problem_id,
+        'status': result['status'],
+        'z': result['z'],
+        'vb': result['vb'],
+        'iterations': result['iterations'],
+        'cached': result['cached'],
+        'time': time.perf_counter() - start,
+    }
+    if result.get('presolve') is not None:
+        solved['presolve'] = result['presolve']
+    return solved
+
+
+def solve_chunk(chunk, options) -> list:
+    return [solve(index, problem_id, matrix_problem, options) for index, problem_id, matrix_problem in chunk]
+
+
+def chunks(problems, size):
+    problems = iter(problems)
+    while True:
+        chunk = list(islice(problems, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# at most queue_size chunks are in flight, so memory stays bounded however
+# long the input stream is
+def solve_all(problems, options, processes, chunksize, queue_size, ordered):
+    if processes == 1:
+        for chunk in chunks(problems, chunksize):
+            yield from solve_chunk(chunk, options)
+        return
+    with ProcessPoolExecutor(processes) as executor:
+        pending = deque()
+        for chunk in chunks(problems, chunksize):
+            pending.append(executor.submit(solve_chunk, chunk, options))
+            while len(pending) >= queue_size:
+                yield from collect(pending, ordered)
+        while pending:
+            yield from collect(pending, ordered)
+
+
+def collect(pending, ordered):
+    if ordered:
+        yield from pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield from future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve matrix_problem JSON lines headlessly")
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help="JSON/JSON-lines files or directories, '-' reads stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSON-lines result file, '-' writes stdout")
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--chunksize', type=int, default=16, help="problems sent to a worker at once")
+    parser.add_argument('--queue-size', type=int, default=None, help="chunks in flight (default 4 per process)")
+    parser.add_argument('--unordered', action='store_true', help="write results as they complete")
+    parser.add_argument('--engine', choices=['tableau', 'revised'], default='tableau')
+    parser.add_argument('--pricing', choices=sorted(sp.PRICING_RULES), default='dantzig')
+    parser.add_argument('--method', choices=['big_m', 'two_phase'], default='big_m',
+                        help="how artificial variables are driven out")
+    parser.add_argument('--presolve', action='store_true', help="reduce and scale each problem before solving")
+    parser.add_argument('--profile', type=int, default=0, metavar='INTERVAL',
+                        help="add a profiling report, sampling z every INTERVAL pivots")
+    parser.add_argument('--interior-point', action='store_true',
+                        help="solve with the interior-point method, then cross over to a simplex basis")
+    parser.add_argument('--cache-dir', default=None,
+                        help="reuse results (and warm-start bases) stored in this directory")
+    parser.add_argument('--max-iterations', type=int, default=None)
+    parser.add_argument('--time-limit', type=float, default=None, help="seconds per problem")
+    args = parser.parse_args(argv)
+    if args.interior_point and (args.presolve or args.cache_dir):
+        parser.error("--interior-point can't be combined with --presolve or --cache-dir")
+    if args.profile and args.cache_dir:
+        parser.error("--profile can't be combined with --cache-dir")
+
+    options = {
+        'engine': args.engine,
+        'pricing': args.pricing,
+        'method': args.method,
+        'presolve': args.presolve,
+        'profile': args.profile,
+        'cache_dir': args.cache_dir,
+        'interior_point': args.interior_point,
+        'max_iterations': args.max_iterations,
+        'time_limit': args.time_limit,
+    }
+    queue_size = args.queue_size or 4 * args.processes
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        results = solve_all(read_problems(args.inputs), options, args.processes, args.chunksize, queue_size,
+                            not args.unordered)
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,73 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QTableWidget, QTableWidgetItem, QVBoxLayout, QLabel, \
-    QComboBox, QPushButton, QHBoxLayout, QSizePolicy, QLineEdit
+    QComboBox, QPushButton, QHBoxLayout, QSizePolicy, QLineEdit, QSlider, QFileDialog
 from PyQt5.QtCore import Qt
 import sympy
 import numpy as np
+import scipy.sparse
+import model_io
 import simplex as sp
 import sys
+import time
 
 M = sympy.Symbol('M', positive=True)
 HEADER_SPACE = 11
+MAX_TABLE_HEIGHT = 400
+PIVOT_COLOR = QtGui.QColor(255, 200, 120)
+PIVOT_LINE_COLOR = QtGui.QColor(255, 240, 200)
+PROGRESS_INTERVAL = 0.05
+MODEL_FILTER = "Modelos (*.csv *.mps *.npy *.npz)"
 global simplex
 
 
 class TableModel(QtCore.QAbstractTableModel):
 
-    def __init__(self, data, header):
+    def __init__(self, data, header, pivot=None):
         super(TableModel, self).__init__()
         self._data = data
+        self._strings = np.empty(data.shape, dtype=object)
         self.header = header
+        self.pivot = pivot
+
+    # swaps the array without rebuilding the model: cached strings are dropped
+    # and repainted only for the cells that differ from the previous array
+    def set_data(self, data, header, pivot=None):
+        if data.shape != self._data.shape:
+            self.beginResetModel()
+            self._data = data
+            self._strings = np.empty(data.shape, dtype=object)
+            self.header = header
+            self.pivot = pivot
+            self.endResetModel()
+            return
+        changed = data != self._data
+        self._strings[changed] = None
+        self._data = data
+        for line in np.flatnonzero(changed.any(axis=1)):
+            columns = np.flatnonzero(changed[line])
+            self.dataChanged.emit(self.index(line, columns[0]), self.index(line, columns[-1]), [Qt.DisplayRole])
+        if header != self.header:
+            self.header = header
+            self.headerDataChanged.emit(Qt.Horizontal, 0, len(header) - 1)
+        if pivot != self.pivot:
+            for line, column in [p for p in (self.pivot, pivot) if p is not None]:
+                self.dataChanged.emit(self.index(line, 0), self.index(line, data.shape[1] - 1), [Qt.BackgroundRole])
+                self.dataChanged.emit(self.index(0, column), self.index(data.shape[0] - 1, column), [Qt.BackgroundRole])
+            self.pivot = pivot
 
     def data(self, index, role):
         if role == Qt.DisplayRole:
-            value = self._data[index.row(), index.column()]
-            return str(value)
+            text = self._strings[index.row(), index.column()]
+            if text is None:
+                text = str(self._data[index.row(), index.column()])
+                self._strings[index.row(), index.column()] = text
+            return text
+        if role == Qt.BackgroundRole and self.pivot is not None:
+            line, column = self.pivot
+            if index.row() == line and index.column() == column:
+                return PIVOT_COLOR
+            if index.row() == line or index.column() == column:
+                return PIVOT_LINE_COLOR
 
     def rowCount(self, index):
         return self._data.shape[0]
@@ -36,6 +81,29 @@ class TableModel(QtCore.QAbstractTableModel):
         return super().headerData(section, orientation, role)
 
 
+# Runs simplex.execute off the event loop. Progress (iterations, z, elapsed
+# seconds) is emitted at most every PROGRESS_INTERVAL, plus once at the end.
+class SolveWorker(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int, float, float)
+
+    def __init__(self, simplex):
+        super(SolveWorker, self).__init__()
+        self.simplex = simplex
+        self.start_time = 0
+        self.last_report = 0
+
+    def run(self):
+        self.start_time = time.perf_counter()
+        self.simplex.execute(callback=self.report)
+        self.report(self.simplex, force=True)
+
+    def report(self, simplex, force=False):
+        now = time.perf_counter()
+        if force or now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            self.progress.emit(simplex.iterations, float(simplex.get_z()), now - self.start_time)
+
+
 class Initial(QMainWindow):
     def __init__(self):
         super(Initial, self).__init__()
@@ -86,6 +154,10 @@ class Initial(QMainWindow):
         self.solve_btn = QPushButton('Solver', self)
 
         self.solve_btn.clicked.connect(self.solve_event)
+        self.import_btn = QPushButton('Importar', self)
+        self.import_btn.clicked.connect(self.import_event)
+        self.export_btn = QPushButton('Exportar', self)
+        self.export_btn.clicked.connect(self.export_event)
 
         self.operation_combo = QComboBox()
         for item in ["Maximize", "Minimize"]:
@@ -101,6 +173,8 @@ class Initial(QMainWindow):
         vbox_layout1.addWidget(self.del_col_btn)
         vbox_layout1.addWidget(self.operation_combo)
         vbox_layout1.addWidget(self.solve_btn)
+        vbox_layout1.addWidget(self.import_btn)
+        vbox_layout1.addWidget(self.export_btn)
 
         central_widget = QWidget(self)
         self.setCentralWidget(central_widget)
@@ -185,8 +259,7 @@ class Initial(QMainWindow):
                                             self.constraint_table.columnCount() - 2, equality_signs_combo)
         self.constraint_table.resizeRowsToContents()
 
-    def solve_event(self):
-        global simplex
+    def read_matrix(self):
         matrix = np.zeros([self.num_lines + 1, self.num_columns + 2], dtype=float)
         matrix[0][0] = self.operation_combo.currentIndex()
         for column in range(0, self.num_columns):
@@ -210,49 +283,112 @@ class Initial(QMainWindow):
                 matrix[line + 1][self.num_columns + 1] = item.text()
             else:
                 matrix[line + 1][self.num_columns + 1] = 0
+        return matrix
+
+    def import_event(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Importar modelo", "", MODEL_FILTER)
+        if path:
+            self.fill_tables(model_io.load(path, sparse=True))
+
+    def export_event(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Exportar modelo", "", MODEL_FILTER)
+        if path:
+            model_io.save(path, self.read_matrix())
+
+    # rebuilds both tables at the model size with repaints and signals off,
+    # creating items only for the nonzero coefficients
+    def fill_tables(self, matrix_problem):
+        config = sp.dense_column(matrix_problem, 0)
+        b = sp.dense_column(matrix_problem, -1)
+        coefficients = scipy.sparse.coo_matrix(matrix_problem[:, 1:-1])
+        self.num_lines = matrix_problem.shape[0] - 1
+        self.num_columns = matrix_problem.shape[1] - 2
+        tables = [self.objective_fxn_table, self.constraint_table]
+        for table in tables:
+            table.setUpdatesEnabled(False)
+            table.blockSignals(True)
+            table.clear()
+            table.setRowCount(0)
+            table.setColumnCount(self.num_columns + 2)
+            table.setHorizontalHeaderLabels(self.create_header_labels(self.num_columns))
+        self.objective_fxn_table.setRowCount(1)
+        self.constraint_table.setRowCount(self.num_lines)
+
+        self.operation_combo.setCurrentIndex(1 if config[0] == 1 else 0)
+        self.objective_fxn_table.setCellWidget(0, self.num_columns, self.create_equality_combo(["="]))
+        z_item = QTableWidgetItem("Z")
+        z_item.setFlags(Qt.ItemIsEnabled)
+        self.objective_fxn_table.setItem(0, self.num_columns + 1, z_item)
+        for line in range(self.num_lines):
+            combo = self.create_equality_combo(self.CONSTRAINT_EQUALITY_SIGNS)
+            combo.setCurrentIndex(int(config[line + 1]) - 1)
+            self.constraint_table.setCellWidget(line, self.num_columns, combo)
+        for line in np.flatnonzero(b[1:]):
+            self.constraint_table.setItem(line, self.num_columns + 1, QTableWidgetItem(repr(float(b[line + 1]))))
+        for line, column, value in zip(coefficients.row, coefficients.col, coefficients.data):
+            table = self.objective_fxn_table if line == 0 else self.constraint_table
+            table.setItem(max(line - 1, 0), column, QTableWidgetItem(repr(float(value))))
+
+        for table in tables:
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+
+    def create_equality_combo(self, equality_signs):
+        equality_signs_combo = QComboBox()
+        for item in equality_signs:
+            equality_signs_combo.addItem(item)
+        return equality_signs_combo
+
+    # the viewer opens on the first tableau while the worker keeps solving
+    def solve_event(self):
+        global simplex
+        matrix = self.read_matrix()
+        if widget.count() > 1:
+            widget.widget(1).stop_solve()
         simplex = sp.Simplex(matrix)
-        simplex.execute()
-        solution = Solution(0)
-        widget.addWidget(solution)
+        if widget.count() > 1:
+            solution = widget.widget(1)
+            solution.load()
+        else:
+            solution = Solution()
+            widget.addWidget(solution)
         widget.setCurrentWidget(solution)
+        solution.start_solve()
 
 
+# A single viewer per session: stepping swaps the arrays behind the models
+# instead of rebuilding the window, and the slider jumps to any iteration.
+# The pivot applied next is highlighted on the current algorithm.
 class Solution(QMainWindow):
-    def __init__(self, algorithm_index):
+    def __init__(self):
         super(Solution, self).__init__()
-        self.algorithm_index = algorithm_index
-        self.new_widgets = []
-        self.num_lines = 2
-        self.num_columns = 2
+        self.algorithm_index = 0
+        self.worker = None
 
         self.create_ui()
         self.set_ui_layout()
+        self.load()
 
         self.setFixedWidth(self.sizeHint().width() + 400)
-        self.setFixedHeight(self.sizeHint().height())
         self.setWindowFlags(Qt.WindowCloseButtonHint | Qt.WindowMinimizeButtonHint)
 
     def create_ui(self):
+        global simplex
         self.algorithm_label = QLabel("Algoritmo", self)
         self.algorithm_label.setFixedHeight(self.algorithm_label.sizeHint().height())
-        self.algorithm_table = self.create_table()
-
+        self.algorithm_model = TableModel(simplex.get_algorithm(0), simplex.get_header(0))
+        self.algorithm_table = self.create_table(self.algorithm_model)
         self.algorithm_table.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum)
-        self.algorithm_table.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.algorithm_table.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        self.algorithm_table.resizeColumnsToContents()
-        self.algorithm_table.setFixedHeight(
-            self.algorithm_table.verticalHeader().length() + self.algorithm_table.horizontalHeader().height() +
-            self.algorithm_table.horizontalScrollBar().height() - 15)
+        # sizing columns from the first lines only keeps large tableaux cheap
+        self.algorithm_table.horizontalHeader().setResizeContentsPrecision(10)
 
         self.vb_label = QLabel("VBs", self)
         self.vb_label.setFixedHeight(self.vb_label.sizeHint().height())
-        self.vb_table = self.create_vb_line()
+        self.vb_model = TableModel(np.zeros([1, 0]), [])
+        self.vb_table = self.create_table(self.vb_model)
         self.vb_table.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.vb_table.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
-        self.vb_table.setFixedHeight(
-            self.vb_table.verticalHeader().length() + self.vb_table.horizontalHeader().height() +
-            self.algorithm_table.horizontalScrollBar().height() - 15)
 
         self.new_simplex_btn = QPushButton('Novo Simplex', self)
         self.new_simplex_btn.clicked.connect(self.new_simplex_event)
@@ -260,17 +396,33 @@ class Solution(QMainWindow):
         self.previous_algorithm_btn.clicked.connect(self.previous_algorithm_event)
         self.next_algorithm_btn = QPushButton("Próximo", self)
         self.next_algorithm_btn.clicked.connect(self.next_algorithm_event)
+        self.cancel_btn = QPushButton("Cancelar", self)
+        self.cancel_btn.clicked.connect(self.cancel_event)
+        self.cancel_btn.setEnabled(False)
+        self.progress_label = QLabel(self)
+
+        self.algorithm_slider = QSlider(Qt.Horizontal, self)
+        self.algorithm_slider.valueChanged.connect(self.show_algorithm)
+        self.iteration_label = QLabel(self)
 
         self.z_label = QLabel("Z")
-        self.z_box = self.create_z()
+        self.z_box = QLineEdit()
         self.z_box.setReadOnly(True)
 
+        self.sensitivity_label = QLabel("Sensibilidade", self)
+        self.sensitivity_label.setFixedHeight(self.sensitivity_label.sizeHint().height())
+        self.sensitivity_table = QTableWidget(self)
+        self.sensitivity_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+
     def set_ui_layout(self):
         vbox_layout1 = QHBoxLayout(self)
         vbox_layout2 = QVBoxLayout(self)
         vbox_layout1.addWidget(self.new_simplex_btn)
         vbox_layout1.addWidget(self.previous_algorithm_btn)
         vbox_layout1.addWidget(self.next_algorithm_btn)
+        vbox_layout1.addWidget(self.algorithm_slider)
+        vbox_layout1.addWidget(self.iteration_label)
+        vbox_layout1.addWidget(self.cancel_btn)
 
         central_widget = QWidget(self)
         self.setCentralWidget(central_widget)
@@ -278,6 +430,7 @@ class Solution(QMainWindow):
         main_v_layout = QVBoxLayout(self)
         central_widget.setLayout(main_v_layout)
 
+        vbox_layout2.addWidget(self.progress_label)
         vbox_layout2.addWidget(self.algorithm_label)
         vbox_layout2.addWidget(self.algorithm_table)
         vbox_layout2.addWidget(self.vb_label)
@@ -286,58 +439,133 @@ class Solution(QMainWindow):
         vbox_layout2.addWidget(self.z_label)
         vbox_layout2.addWidget(self.z_box)
 
+        vbox_layout2.addWidget(self.sensitivity_label)
+        vbox_layout2.addWidget(self.sensitivity_table)
+
         main_v_layout.addLayout(vbox_layout1)
         main_v_layout.addLayout(vbox_layout2)
 
-    def create_table(self):
-        global simplex
-        header = simplex.get_header()
+    def create_table(self, model):
         table = QtWidgets.QTableView(self)
-        model = TableModel(simplex.get_algorithm(self.algorithm_index), header)
         table.setModel(model)
         table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         return table
 
-    def create_vb_line(self):
+    # called once per solve; stepping afterwards only goes through show_algorithm
+    def load(self):
+        global simplex
+        last = len(simplex.algorithms) - 1
+        self.has_sensitivity = self.fill_sensitivity_table()
+        self.algorithm_slider.blockSignals(True)
+        self.algorithm_slider.setRange(0, last)
+        self.algorithm_slider.setValue(0)
+        self.algorithm_slider.blockSignals(False)
+        self.show_algorithm(0)
+
+        self.algorithm_table.resizeColumnsToContents()
+        self.algorithm_table.setFixedHeight(min(
+            self.algorithm_table.verticalHeader().length() + self.algorithm_table.horizontalHeader().height() +
+            self.algorithm_table.horizontalScrollBar().height() + 5, MAX_TABLE_HEIGHT))
+        self.vb_table.setFixedHeight(
+            self.vb_table.verticalHeader().length() + self.vb_table.horizontalHeader().height() +
+            self.vb_table.horizontalScrollBar().height() + 5)
+
+    def show_algorithm(self, index):
         global simplex
-        vb = simplex.get_vb(self.algorithm_index)
-        columns = len(vb)
-        vb_line = QTableWidget(self)
-        vb_line.setColumnCount(columns)
-        vb_line.setRowCount(1)
-        vb_line.setHorizontalHeaderLabels([" " * HEADER_SPACE + i + " " * HEADER_SPACE for i in vb])
-        for i, value in enumerate(vb.values()):
-            vb_line.setItem(0, i, QTableWidgetItem(str(value)))
-        vb_line.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
-        return vb_line
+        last = len(simplex.algorithms) - 1
+        self.algorithm_index = index
+        pivot = simplex.algorithms.get_pivot(index + 1) if index < last else None
+        self.algorithm_model.set_data(simplex.get_algorithm(index), simplex.get_header(index), pivot)
+        vb = simplex.get_vb(index)
+        self.vb_model.set_data(np.array([list(vb.values())]), list(vb))
+        self.z_box.setText(str(simplex.get_z(index)))
+        self.iteration_label.setText(f"{index} / {last}")
+        self.sensitivity_label.setVisible(self.has_sensitivity and index == last)
+        self.sensitivity_table.setVisible(self.has_sensitivity and index == last)
+        self.algorithm_slider.blockSignals(True)
+        self.algorithm_slider.setValue(index)
+        self.algorithm_slider.blockSignals(False)
+
+    # only the final algorithm of an optimal solve has a meaningful basis
+    def fill_sensitivity_table(self):
+        global simplex
+        if simplex.status != sp.OPTIMAL:
+            return False
+        sensitivity = simplex.sensitivity()
+        names = sensitivity.constraint_names + sensitivity.variable_names[:simplex.num_var]
+        values = np.concatenate([sensitivity.duals, sensitivity.reduced_costs[:simplex.num_var]])
+        ranges = np.vstack([sensitivity.rhs_ranges, sensitivity.cost_ranges])
+        table = self.sensitivity_table
+        table.clear()
+        table.setColumnCount(4)
+        table.setRowCount(len(names))
+        table.setHorizontalHeaderLabels(["Dual / Custo reduzido", "Valor atual", "Mínimo", "Máximo"])
+        table.setVerticalHeaderLabels(names)
+        current = np.concatenate([sensitivity.rhs, sensitivity.costs])
+        for i in range(len(names)):
+            for j, value in enumerate([values[i], current[i], ranges[i, 0], ranges[i, 1]]):
+                table.setItem(i, j, QTableWidgetItem(str(value)))
+        table.resizeColumnsToContents()
+        return True
+
+    def start_solve(self):
+        global simplex
+        self.worker = SolveWorker(simplex)
+        self.worker.progress.connect(self.progress_event)
+        self.worker.finished.connect(self.finished_event)
+        self.cancel_btn.setEnabled(True)
+        self.progress_label.setText("Resolvendo...")
+        self.worker.start()
+
+    def stop_solve(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.simplex.cancel()
+            self.worker.wait()
+
+    def cancel_event(self):
+        if self.worker is not None:
+            self.worker.simplex.cancel()
+
+    # steps already stored can be browsed while later ones are computed
+    def progress_event(self, iterations, z, elapsed):
+        global simplex
+        if self.sender() is not self.worker:
+            return
+        last = len(simplex.algorithms) - 1
+        self.algorithm_slider.setMaximum(last)
+        self.iteration_label.setText(f"{self.algorithm_index} / {last}")
+        self.progress_label.setText(f"Iterações: {iterations}    Z: {z}    Tempo: {elapsed:.2f} s")
+
+    def finished_event(self):
+        global simplex
+        if self.sender() is not self.worker:
+            return
+        self.cancel_btn.setEnabled(False)
+        self.progress_label.setText(self.progress_label.text() + f"    Status: {simplex.status}")
+        self.has_sensitivity = self.fill_sensitivity_table()
+        self.algorithm_slider.setMaximum(len(simplex.algorithms) - 1)
+        self.show_algorithm(self.algorithm_index)
 
     def new_simplex_event(self):
         widget.setCurrentWidget(initial)
 
     def previous_algorithm_event(self):
         if self.algorithm_index > 0:
-            self.algorithm_index -= 1
-        self.reload()
+            self.show_algorithm(self.algorithm_index - 1)
 
     def next_algorithm_event(self):
         global simplex
         if self.algorithm_index < len(simplex.algorithms) - 1:
-            self.algorithm_index += 1
-        self.reload()
-
-    def reload(self):
-        solution = widget.widget(1)
-        widget.removeWidget(solution)
-        solution = Solution(self.algorithm_index)
-        widget.addWidget(solution)
-        widget.setCurrentWidget(solution)
+            self.show_algorithm(self.algorithm_index + 1)
+
 
-    def create_z(self):
-        z = QLineEdit(str(simplex.get_z(self.algorithm_index)))
-        return z
+def quit_event():
+    if widget.count() > 1:
+        widget.widget(1).stop_solve()
 
 
 app = QApplication(sys.argv)
+app.aboutToQuit.connect(quit_event)
 widget = QtWidgets.QStackedWidget()
 
 initial = Initial()
@@ -0,0 +1,209 @@
+import time
+
+import numpy as np
+from scipy.linalg import LinAlgError, cho_factor, cho_solve
+from scipy.linalg.blas import dsyrk
+
+import simplex as sp
+
+# fraction of the way to the boundary each step may go
+STEP_FACTOR = 0.99
+# x or y past this size (relative to the data) means the problem is
+# unbounded or infeasible; the simplex then settles which
+DIVERGENCE = 1e12
+# iterations without a better residual before the run counts as stalled
+STALL_ITERATIONS = 5
+# a column joins the crossover basis when this fraction of its norm lies
+# outside the span of the columns already chosen
+INDEPENDENCE_TOLERANCE = 1e-6
+
+
+# Mehrotra predictor-corrector on min c.x, A x = b, x >= 0 over the
+# structural and slack/surplus columns of a Simplex built from the same
+# matrix_problem (artificials are left out). Each step solves the normal
+# equations A D A^T dy = r with a LAPACK Cholesky of the dense matrix. The
+# crossover picks a basis from the interior solution (largest x_j / s_j
+# first, completed with logical columns) and hands it to
+# Simplex.warm_execute, which pivots to an optimal basis, so get_vb, get_z
+# and sensitivity come from the simplex as usual. A run that doesn't
+# converge falls back to a cold simplex solve.
+class InteriorPoint:
+
+    def __init__(self, matrix_problem, engine='revised', pricing='dantzig', method='big_m', tolerance=1e-8,
+                 max_iterations=200):
+        self.simplex = sp.Simplex(matrix_problem, engine=engine, history='none', pricing=pricing, method=method)
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.iterations = 0
+        self.crossover_iterations = 0
+        self.converged = False
+        self.status = None
+        simplex = self.simplex
+        self.matrix = simplex.constraint_matrix()
+        self.a = self.matrix[:, :simplex.first_artificial()]
+        self.b = sp.dense_column(simplex.matrix_problem, -1)[1:]
+        self.c = np.zeros(self.a.shape[1])
+        objective = simplex.matrix_problem[0, 1:-1]
+        objective = objective.toarray().ravel() if sp.is_sparse(objective) else np.asarray(objective, dtype=float)
+        self.c[:simplex.num_var] = objective if simplex.fo_min else -objective
+        # each slack/surplus column is +-e_i, so it only adds to the diagonal
+        # of A D A^T
+        self.structural = np.ascontiguousarray(self.a[:, :simplex.num_var])
+        self.logical_lines = np.zeros(self.a.shape[1] - simplex.num_var, dtype=int)
+        if simplex.num_rest > 0:
+            self.logical_lines = np.argmax(np.abs(self.a[:, simplex.num_var:]), axis=0)
+        self.x = None
+        self.y = None
+        self.s = None
+
+    def execute(self, max_iterations=None, time_limit=None) -> str:
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        with np.errstate(all='ignore'):
+            self.converged = self.solve(deadline)
+        if deadline is not None and time.perf_counter() >= deadline:
+            self.status = sp.TIME_LIMIT
+            return self.status
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        if self.converged:
+            self.status = self.crossover(max_iterations, remaining)
+        else:
+            self.status = self.simplex.execute(max_iterations, remaining)
+        return self.status
+
+    # True once the relative primal and dual residuals and the gap are all
+    # under tolerance. Near the optimum A D A^T gets too ill-conditioned for
+    # the primal residual to keep falling; a stalled run whose best point is
+    # within sqrt(tolerance) also counts, the crossover cleans it up.
+    def solve(self, deadline) -> bool:
+        if self.a.shape[0] == 0:
+            return False
+        a, b, c = self.a, self.b, self.c
+        x, y, s = self.starting_point()
+        scale = 1 + max(np.linalg.norm(b), np.linalg.norm(c))
+        best, best_error, stalled = (x, y, s), np.inf, 0
+        for self.iterations in range(1, self.max_iterations + 1):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            primal_residual = a @ x - b
+            dual_residual = a.T @ y + s - c
+            error = max(np.linalg.norm(primal_residual) / (1 + np.linalg.norm(b)),
+                        np.linalg.norm(dual_residual) / (1 + np.linalg.norm(c)),
+                        abs(c @ x - b @ y) / (1 + abs(c @ x)))
+            if not np.isfinite(error) or np.max(x) > DIVERGENCE * scale or np.max(np.abs(y)) > DIVERGENCE * scale:
+                break
+            if error < best_error:
+                best, best_error, stalled = (x, y, s), error, 0
+            else:
+                stalled += 1
+            if error <= self.tolerance or stalled >= STALL_ITERATIONS:
+                break
+            mu = x @ s / len(x)
+            d = x / s
+            factor = self.factorize(d)
+            # predictor: the affine scaling direction
+            dx, dy, ds = self.direction(factor, d, x, s, primal_residual, dual_residual, x * s)
+            primal_step = max_step(x, dx)
+            dual_step = max_step(s, ds)
+            mu_affine = (x + primal_step * dx) @ (s + dual_step * ds) / len(x)
+            sigma = (mu_affine / mu) ** 3
+            # corrector: second order term plus centering
+            dx, dy, ds = self.direction(factor, d, x, s, primal_residual, dual_residual,
+                                        x * s + dx * ds - sigma * mu)
+            primal_step = min(1.0, STEP_FACTOR * max_step(x, dx))
+            dual_step = min(1.0, STEP_FACTOR * max_step(s, ds))
+            x = x + primal_step * dx
+            y = y + dual_step * dy
+            s = s + dual_step * ds
+        self.x, self.y, self.s = best
+        return best_error <= self.tolerance or (stalled >= STALL_ITERATIONS and best_error <= np.sqrt(self.tolerance))
+
+    # Mehrotra's heuristic: least-squares x and (y, s), shifted positive
+    def starting_point(self):
+        a, b, c = self.a, self.b, self.c
+        factor = self.factorize(np.ones(a.shape[1]))
+        x = a.T @ cho_solve(factor, b)
+        y = cho_solve(factor, a @ c)
+        s = c - a.T @ y
+        x += max(-1.5 * np.min(x), 0.0)
+        s += max(-1.5 * np.min(s), 0.0)
+        if x @ s == 0:
+            x += 1.0
+            s += 1.0
+        x_shift = 0.5 * (x @ s) / np.sum(s)
+        s_shift = 0.5 * (x @ s) / np.sum(x)
+        return x + x_shift, y, s + s_shift
+
+    # Cholesky of A D A^T (upper triangle, from a BLAS rank-k update);
+    # redundant equality lines make it singular, so the diagonal is
+    # regularized, more each time the factorization fails
+    def factorize(self, d):
+        num_var = self.structural.shape[1]
+        scaled = self.structural * np.sqrt(d[:num_var])
+        normal = dsyrk(1.0, scaled.T, trans=1)
+        diagonal = np.zeros(len(normal))
+        np.add.at(diagonal, self.logical_lines, d[num_var:])
+        normal[np.diag_indices_from(normal)] += diagonal
+        regularization = 1e-12 * max(1.0, np.max(np.diag(normal)))
+        while True:
+            try:
+                return cho_factor(normal + regularization * np.eye(len(normal)), lower=False, check_finite=False)
+            except LinAlgError:
+                regularization *= 100
+
+    # solves A dx = -rp, A^T dy + ds = -rd, S dx + X ds = -rxs
+    def direction(self, factor, d, x, s, primal_residual, dual_residual, rxs):
+        dy = cho_solve(factor, check_finite=False, b=-primal_residual + self.a @ (rxs / s - d * dual_residual))
+        ds = -dual_residual - self.a.T @ dy
+        dx = -(rxs + x * ds) / s
+        return dx, dy, ds
+
+    # basis from the interior solution: columns by decreasing x_j / (x_j + s_j),
+    # then the artificials, keeping each one independent of those before it
+    def crossover(self, max_iterations, time_limit) -> str:
+        simplex = self.simplex
+        num_columns = self.a.shape[1]
+        order = np.argsort(-self.x / (self.x + self.s), kind='stable')
+        order = np.concatenate([order, np.arange(num_columns, self.matrix.shape[1])])
+        basis = independent_columns(self.matrix, order, simplex.num_rest)
+        status = simplex.warm_execute([simplex.names[j] for j in basis], max_iterations, time_limit)
+        self.crossover_iterations = simplex.iterations
+        return status
+
+    def get_vb(self) -> dict:
+        return self.simplex.get_vb()
+
+    def get_z(self) -> float:
+        return self.simplex.get_z()
+
+    def sensitivity(self):
+        return self.simplex.sensitivity()
+
+
+def max_step(values, direction) -> float:
+    decreasing = direction < 0
+    if not np.any(decreasing):
+        return np.inf
+    return float(np.min(-values[decreasing] / direction[decreasing]))
+
+
+# first count columns of matrix, in order, each with a component outside
+# the span of those before it (Gram-Schmidt, orthogonalized twice)
+def independent_columns(matrix, order, count) -> list:
+    q = np.zeros([matrix.shape[0], count])
+    chosen = []
+    for j in order:
+        column = matrix[:, j]
+        norm = np.linalg.norm(column)
+        if norm == 0:
+            continue
+        residual = column / norm
+        span = q[:, :len(chosen)]
+        for _ in range(2):
+            residual = residual - span @ (span.T @ residual)
+        residual_norm = np.linalg.norm(residual)
+        if residual_norm > INDEPENDENCE_TOLERANCE:
+            q[:, len(chosen)] = residual / residual_norm
+            chosen.append(j)
+            if len(chosen) == count:
+                break
+    return chosen
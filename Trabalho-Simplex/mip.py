@@ -0,0 +1,233 @@
+import heapq
+import math
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import count
+
+import numpy as np
+import scipy.sparse
+
+import simplex as sp
+
+INTEGER_TOLERANCE = 1e-6
+STRATEGIES = ('best_bound', 'depth_first')
+
+# problem, Simplex options and shared incumbent of the current process, set
+# once per worker by init_worker
+worker = {}
+
+
+# a node whose bound key can't beat the incumbent key by more than gap
+def dominated(key, incumbent, gap) -> bool:
+    return incumbent < math.inf and key >= incumbent - gap * (1 + abs(incumbent))
+
+
+def init_worker(matrix_problem, options, incumbent) -> None:
+    worker['matrix_problem'] = matrix_problem
+    worker['options'] = options
+    worker['incumbent'] = incumbent
+
+
+# the root problem plus one line per branching bound (column, config, value)
+def node_problem(matrix_problem, bounds):
+    if not bounds:
+        return matrix_problem
+    lines = np.zeros([len(bounds), matrix_problem.shape[1]])
+    for i, (column, config, value) in enumerate(bounds):
+        lines[i, 0] = config
+        lines[i, column + 1] = 1
+        lines[i, -1] = value
+    if scipy.sparse.issparse(matrix_problem):
+        return scipy.sparse.vstack([matrix_problem, lines]).tocsr()
+    return np.vstack([matrix_problem, lines])
+
+
+# Solves one node: the root cold, every other node warm from its parent's
+# basis (its new bound line starts with its own logical variable basic, so
+# the dual simplex restores feasibility). A node whose parent bound can no
+# longer beat the shared incumbent is pruned without solving. key is the
+# objective in minimization sense.
+def evaluate(bounds, basis, parent_key, gap):
+    if dominated(parent_key, worker['incumbent'].value, gap):
+        return {'status': 'pruned'}
+    simplex = sp.Simplex(node_problem(worker['matrix_problem'], bounds), history='none', **worker['options'])
+    if basis is None:
+        status = simplex.execute()
+    else:
+        status = simplex.warm_execute(basis)
+    if status != sp.OPTIMAL:
+        return {'status': status, 'iterations': simplex.iterations}
+    z = float(simplex.get_z())
+    return {
+        'status': status,
+        'z': z,
+        'key': z if simplex.fo_min else -z,
+        'vb': {name: float(value) for name, value in simplex.get_vb().items()},
+        'basis': simplex.get_basic_names(),
+        'iterations': simplex.iterations,
+    }
+
+
+# Branch and bound over the integer variables (indices as in update_c) of
+# a matrix_problem. Each node is an LP with extra bound lines; a fractional
+# integer variable of its optimal basis (the most fractional) splits it
+# into x <= floor and x >= ceil children. Nodes are solved in a process
+# pool (in this process when processes is 1) and picked by best bound or
+# depth first; the incumbent lives in shared memory so workers prune too.
+# With a time or node limit the best incumbent found so far is kept.
+class BranchAndBound:
+
+    def __init__(self, matrix_problem, integer, strategy='best_bound', processes=1, engine='revised',
+                 pricing='dantzig', method='big_m', gap=1e-9):
+        if strategy not in STRATEGIES:
+            raise Exception("Invalid node selection strategy")
+        self.matrix_problem = matrix_problem
+        self.integer = sorted(int(j) for j in integer)
+        self.strategy = strategy
+        self.processes = processes
+        self.options = {'engine': engine, 'pricing': pricing, 'method': method}
+        self.gap = gap
+        self.names = set(sp.Simplex(matrix_problem, history='none', **self.options).variable_names())
+        self.fo_min = float(matrix_problem[0, 0]) == 1
+        self.status = None
+        self.incumbent = None
+        self.best_bound = None
+        self.nodes = 0
+        self.iterations = 0
+        self.open = []
+        self.counter = count()
+
+    def execute(self, time_limit=None, max_nodes=None) -> str:
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        shared = multiprocessing.Value('d', math.inf, lock=False)
+        self.push([], None, -math.inf, 0)
+        if self.processes == 1:
+            init_worker(self.matrix_problem, self.options, shared)
+            limit = self.run_serial(shared, deadline, max_nodes)
+        else:
+            executor = ProcessPoolExecutor(self.processes, initializer=init_worker,
+                                           initargs=(self.matrix_problem, self.options, shared))
+            try:
+                limit = self.run_parallel(executor, shared, deadline, max_nodes)
+            finally:
+                # nodes still running past a time limit are not waited for
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.best_bound = min([entry[-1][2] for entry in self.open] + [self.incumbent_key()])
+        if self.status is None:
+            if limit is not None:
+                self.status = limit
+            else:
+                self.status = sp.OPTIMAL if self.incumbent is not None else sp.INFEASIBLE
+        return self.status
+
+    def run_serial(self, shared, deadline, max_nodes):
+        while self.open:
+            limit = self.check_limits(deadline, max_nodes)
+            if limit is not None:
+                return limit
+            node = self.pop()
+            self.process(node, evaluate(*node[:3], self.gap), shared)
+            if self.status is not None:
+                return None
+        return None
+
+    # up to two nodes per process in flight; the shared incumbent is written
+    # here and read by the workers
+    def run_parallel(self, executor, shared, deadline, max_nodes):
+        pending = {}
+        limit = None
+        while self.open or pending:
+            while self.open and len(pending) < 2 * self.processes and limit is None:
+                limit = self.check_limits(deadline, max_nodes)
+                if limit is None:
+                    node = self.pop()
+                    pending[executor.submit(evaluate, *node[:3], self.gap)] = node
+            if limit is not None or not pending:
+                break
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                limit = sp.TIME_LIMIT
+                break
+            for future in done:
+                self.process(pending.pop(future), future.result(), shared)
+            if self.status is not None:
+                break
+        for future, node in pending.items():
+            future.cancel()
+            heapq.heappush(self.open, (self.priority(node[2], node[3]), next(self.counter), node))
+        return limit
+
+    def check_limits(self, deadline, max_nodes):
+        if deadline is not None and time.perf_counter() >= deadline:
+            return sp.TIME_LIMIT
+        if max_nodes is not None and self.nodes >= max_nodes:
+            return sp.ITERATION_LIMIT
+        return None
+
+    def process(self, node, result, shared) -> None:
+        bounds, basis, parent_key, depth = node
+        if result['status'] == 'pruned':
+            return
+        self.nodes += 1
+        self.iterations += result['iterations']
+        if result['status'] == sp.UNBOUNDED and not bounds:
+            self.status = sp.UNBOUNDED
+            return
+        if result['status'] != sp.OPTIMAL or self.prunable(result['key']):
+            return
+        column, value = self.branching_variable(result['vb'])
+        if column is None:
+            self.incumbent = result
+            shared.value = result['key']
+            self.open = [entry for entry in self.open if not self.prunable(entry[-1][2])]
+            heapq.heapify(self.open)
+            return
+        self.push(bounds + [(column, 1, math.floor(value))], result['basis'], result['key'], depth + 1)
+        self.push(bounds + [(column, 2, math.ceil(value))], result['basis'], result['key'], depth + 1)
+
+    # most fractional integer variable, (None, None) when all are integral
+    def branching_variable(self, vb):
+        best, best_fraction = (None, None), INTEGER_TOLERANCE
+        for column in self.integer:
+            value = vb.get(f'x{column}', 0.0)
+            fraction = min(value - math.floor(value), math.ceil(value) - value)
+            if fraction > best_fraction:
+                best, best_fraction = (column, value), fraction
+        return best
+
+    def prunable(self, key) -> bool:
+        return dominated(key, self.incumbent_key(), self.gap)
+
+    def incumbent_key(self) -> float:
+        return math.inf if self.incumbent is None else self.incumbent['key']
+
+    def priority(self, key, depth):
+        return key if self.strategy == 'best_bound' else (-depth, key)
+
+    def push(self, bounds, basis, parent_key, depth) -> None:
+        node = (bounds, basis, parent_key, depth)
+        heapq.heappush(self.open, (self.priority(parent_key, depth), next(self.counter), node))
+
+    def pop(self):
+        return heapq.heappop(self.open)[-1]
+
+    # the incumbent's variables, without the slacks of the bound lines
+    def get_vb(self) -> dict:
+        if self.incumbent is None:
+            return OrderedDict()
+        return OrderedDict((name, value) for name, value in sorted(self.incumbent['vb'].items())
+                           if name in self.names)
+
+    def get_z(self) -> float:
+        if self.incumbent is None:
+            return math.nan
+        return self.incumbent['z']
+
+    # objective bound still open at the end (minimization sense flipped back)
+    def get_bound(self) -> float:
+        if self.best_bound is None:
+            return math.nan
+        return self.best_bound if self.fo_min else -self.best_bound
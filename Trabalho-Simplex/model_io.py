@@ -0,0 +1,257 @@
+import zipfile
+from array import array
+
+import numpy as np
+import scipy.sparse
+
+# config column codes used by Simplex.read_config_column
+MPS_KINDS = {'L': 1, 'G': 2, 'E': 3}
+KIND_NAMES = {1: 'L', 2: 'G', 3: 'E'}
+
+
+def load(path, sparse=False, mmap=True):
+    if path.endswith('.csv'):
+        return read_csv(path)
+    if path.endswith('.npy'):
+        return read_npy(path, mmap)
+    if path.endswith('.npz'):
+        return read_npz(path, mmap)
+    if path.endswith('.mps'):
+        return read_mps(path, sparse)
+    raise Exception("Unknown model format")
+
+
+def save(path, matrix_problem) -> None:
+    if path.endswith('.csv'):
+        write_csv(path, matrix_problem)
+    elif path.endswith('.npy'):
+        np.save(path, dense(matrix_problem))
+    elif path.endswith('.npz'):
+        write_npz(path, matrix_problem)
+    elif path.endswith('.mps'):
+        write_mps(path, matrix_problem)
+    else:
+        raise Exception("Unknown model format")
+
+
+def dense(matrix_problem):
+    if scipy.sparse.issparse(matrix_problem):
+        return matrix_problem.toarray()
+    return np.asarray(matrix_problem, dtype=float)
+
+
+# one matrix_problem line per CSV line, config column first; '#' starts a comment
+def read_csv(path):
+    return np.loadtxt(path, delimiter=',', ndmin=2, comments='#')
+
+
+def write_csv(path, matrix_problem) -> None:
+    np.savetxt(path, dense(matrix_problem), delimiter=',', fmt='%.17g')
+
+
+def read_npy(path, mmap=True):
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+# a scipy.sparse.save_npz file comes back sparse; otherwise the array stored
+# as 'matrix_problem' (or the only one) is memory-mapped when it was saved
+# uncompressed
+def read_npz(path, mmap=True):
+    with np.load(path) as npz:
+        names = npz.files
+    if 'format' in names and 'indptr' in names:
+        return scipy.sparse.load_npz(path).tocsr()
+    name = 'matrix_problem' if 'matrix_problem' in names else names[0]
+    if mmap:
+        matrix = mmap_npz_member(path, name + '.npy')
+        if matrix is not None:
+            return matrix
+    with np.load(path) as npz:
+        return npz[name]
+
+
+def write_npz(path, matrix_problem) -> None:
+    if scipy.sparse.issparse(matrix_problem):
+        scipy.sparse.save_npz(path, scipy.sparse.csr_matrix(matrix_problem), compressed=False)
+    else:
+        np.savez(path, matrix_problem=matrix_problem)
+
+
+# members of an uncompressed zip sit whole in the file, so the .npy inside
+# can be mapped like a plain .npy once its local header is skipped
+def mmap_npz_member(path, member):
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member)
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, 'rb') as file:
+        file.seek(info.header_offset)
+        local_header = file.read(30)
+        name_length = int.from_bytes(local_header[26:28], 'little')
+        extra_length = int.from_bytes(local_header[28:30], 'little')
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+
+# Free or fixed MPS (whitespace separated fields). Variables keep Simplex's
+# x >= 0: UP, FX and positive LO bounds become constraint lines, and free or
+# negative-bounded variables are rejected. Lines with a negative RHS are
+# negated so the slack basis starts feasible. Entries stream into typed
+# arrays and the matrix is built once, as CSR when sparse is set.
+def read_mps(path, sparse=False):
+    section = None
+    objective = None
+    fo_min = True
+    lines = {}
+    kinds = array('b')
+    columns = {}
+    coefficients = (array('q'), array('q'), array('d'))
+    rhs = {}
+    bounds = []
+    with open(path) as file:
+        for text in file:
+            if not text.strip() or text.startswith('*'):
+                continue
+            fields = text.split()
+            if not text[0].isspace():
+                section = fields[0].upper()
+                if section == 'OBJSENSE' and len(fields) > 1:
+                    fo_min = fields[1].upper() in ('MIN', 'MINIMIZE')
+                elif section == 'ENDATA':
+                    break
+                continue
+            if section == 'OBJSENSE':
+                fo_min = fields[0].upper() in ('MIN', 'MINIMIZE')
+            elif section == 'ROWS':
+                if fields[0].upper() == 'N':
+                    if objective is None:
+                        objective = fields[1]
+                    continue
+                lines[fields[1]] = len(kinds)
+                kinds.append(MPS_KINDS[fields[0].upper()])
+            elif section == 'COLUMNS':
+                if "'MARKER'" in fields:
+                    continue
+                column = columns.setdefault(fields[0], len(columns))
+                for name, value in zip(fields[1::2], fields[2::2]):
+                    line = -1 if name == objective else lines.get(name)
+                    if line is not None:
+                        coefficients[0].append(line)
+                        coefficients[1].append(column)
+                        coefficients[2].append(float(value))
+            elif section == 'RHS':
+                entries = fields[1:] if len(fields) % 2 == 1 else fields
+                for name, value in zip(entries[0::2], entries[1::2]):
+                    rhs[name] = float(value)
+            elif section == 'RANGES':
+                raise Exception("MPS RANGES are not supported")
+            elif section == 'BOUNDS':
+                kind = fields[0].upper()
+                value = float(fields[3]) if len(fields) > 3 else 0.0
+                bounds.append((kind, columns[fields[2]], value))
+
+    num_rest, num_var = len(kinds), len(columns)
+    kinds = np.frombuffer(kinds, dtype=np.int8).astype(float)
+    b = np.zeros(num_rest)
+    for name, value in rhs.items():
+        if name in lines:
+            b[lines[name]] = value
+    constant = 0.0 - rhs.get(objective, 0.0)
+
+    line_index = np.frombuffer(coefficients[0], dtype=np.int64)
+    column_index = np.frombuffer(coefficients[1], dtype=np.int64)
+    values = np.frombuffer(coefficients[2], dtype=float)
+    in_objective = line_index < 0
+    cost = np.zeros(num_var)
+    np.add.at(cost, column_index[in_objective], values[in_objective])
+    matrix = scipy.sparse.csr_matrix((values[~in_objective], (line_index[~in_objective], column_index[~in_objective])),
+                                     shape=(num_rest, num_var))
+
+    bound_lines, bound_kinds, bound_b = bound_constraints(bounds)
+    if len(bound_lines) > 0:
+        unit = scipy.sparse.csr_matrix((np.ones(len(bound_lines)), (np.arange(len(bound_lines)), bound_lines)),
+                                       shape=(len(bound_lines), num_var))
+        matrix = scipy.sparse.vstack([matrix, unit]).tocsr()
+        kinds = np.concatenate([kinds, bound_kinds])
+        b = np.concatenate([b, bound_b])
+
+    negative = b < 0
+    if np.any(negative):
+        flip = np.where(negative, -1.0, 1.0)
+        matrix = scipy.sparse.diags(flip) @ matrix
+        b = flip * b
+        kinds = np.where(negative & (kinds != 3), 3 - kinds, kinds)
+
+    top = np.concatenate([[1.0 if fo_min else 0.0], cost, [constant]])
+    if sparse:
+        body = scipy.sparse.hstack([kinds[:, None], matrix, b[:, None]])
+        return scipy.sparse.vstack([top[None, :], body]).tocsr()
+    matrix_problem = np.empty([len(b) + 1, num_var + 2])
+    matrix_problem[0] = top
+    matrix_problem[1:, 0] = kinds
+    matrix_problem[1:, 1:-1] = matrix.toarray()
+    matrix_problem[1:, -1] = b
+    return matrix_problem
+
+
+def bound_constraints(bounds):
+    lines, kinds, b = [], [], []
+    for kind, column, value in bounds:
+        if kind in ('UP', 'UI'):
+            if value < 0:
+                raise Exception("Negative upper bounds are not supported")
+            lines.append(column)
+            kinds.append(1)
+            b.append(value)
+        elif kind == 'FX':
+            lines.append(column)
+            kinds.append(3)
+            b.append(value)
+        elif kind in ('LO', 'LI'):
+            if value < 0:
+                raise Exception("Negative lower bounds are not supported")
+            if value > 0:
+                lines.append(column)
+                kinds.append(2)
+                b.append(value)
+        elif kind == 'BV':
+            lines.append(column)
+            kinds.append(1)
+            b.append(1.0)
+        elif kind != 'PL':
+            raise Exception(f"MPS bound {kind} is not supported")
+    return np.array(lines, dtype=int), np.array(kinds, dtype=float), np.array(b, dtype=float)
+
+
+def write_mps(path, matrix_problem, name='SIMPLEX') -> None:
+    matrix_problem = scipy.sparse.csc_matrix(matrix_problem, dtype=float)
+    config = matrix_problem[:, [0]].toarray().ravel()
+    num_var = matrix_problem.shape[1] - 2
+    b = matrix_problem[:, [-1]].toarray().ravel()
+    with open(path, 'w') as file:
+        file.write(f"NAME          {name}\n")
+        file.write("OBJSENSE\n    " + ("MIN" if config[0] == 1 else "MAX") + "\n")
+        file.write("ROWS\n N  COST\n")
+        for i, kind in enumerate(config[1:], 1):
+            file.write(f" {KIND_NAMES[int(kind)]}  R{i}\n")
+        file.write("COLUMNS\n")
+        for j in range(num_var):
+            start, end = matrix_problem.indptr[j + 1], matrix_problem.indptr[j + 2]
+            # an all-zero column still needs an entry, or reading drops it
+            if start == end:
+                file.write(f"    x{j:<8} COST     0\n")
+            for i, value in zip(matrix_problem.indices[start:end], matrix_problem.data[start:end]):
+                line = 'COST' if i == 0 else f'R{i}'
+                file.write(f"    x{j:<8} {line:<8} {value:.17g}\n")
+        file.write("RHS\n")
+        if b[0] != 0:
+            file.write(f"    RHS       COST     {-b[0]:.17g}\n")
+        for i in np.flatnonzero(b[1:]) + 1:
+            file.write(f"    RHS       R{i:<7} {b[i]:.17g}\n")
+        file.write("ENDATA\n")
@@ -0,0 +1,257 @@
+import numpy as np
+import scipy.sparse
+from collections import OrderedDict
+
+TOLERANCE = 1e-9
+
+
+# Reduces a matrix_problem (same layout Simplex reads: config column, x
+# columns, b) before the tableau is built, then scales it. Constraint lines
+# and variables keep their original order; each removed line leaves one
+# basic variable behind (the variable it fixed, or its own slack, surplus or
+# artificial), so postsolve rebuilds a full basis in the original space.
+class Presolve:
+
+    def __init__(self, matrix_problem, scale=True, scale_passes=4):
+        self.sparse = scipy.sparse.issparse(matrix_problem)
+        problem = scipy.sparse.csr_matrix(matrix_problem, dtype=float)
+        config = problem[:, [0]].toarray().ravel()
+        self.fo_min = config[0] == 1
+        self.kinds = config[1:].astype(int)
+        self.cost = problem[[0], 1:-1].toarray().ravel()
+        self.constant = problem[0, -1]
+        self.matrix = problem[1:, 1:-1].tocsr()
+        self.matrix.eliminate_zeros()
+        self.original_b = problem[1:, [-1]].toarray().ravel()
+        self.b = self.original_b.copy()
+        num_rest, num_var = self.matrix.shape
+
+        self.infeasible = False
+        self.offset = 0.0
+        self.fixed = {}
+        self.line_basic = {}
+        self.active_lines = np.ones(num_rest, dtype=bool)
+        self.active_columns = np.ones(num_var, dtype=bool)
+        self.removed = OrderedDict([('empty_lines', 0), ('singleton_lines', 0), ('duplicate_lines', 0),
+                                    ('fixed_variables', 0), ('empty_columns', 0)])
+        self.reduce()
+
+        self.lines = np.flatnonzero(self.active_lines)
+        self.columns = np.flatnonzero(self.active_columns)
+        # fixed variables can leave a line with a negative b; it is negated
+        # (<= and >= swapped) so the slack/artificial basis starts feasible
+        self.line_sign = np.where(self.b[self.lines] < 0, -1.0, 1.0)
+        self.line_kinds = self.kinds[self.lines].copy()
+        flipped = (self.line_sign < 0) & (self.line_kinds != 3)
+        self.line_kinds[flipped] = 3 - self.line_kinds[flipped]
+        matrix = self.matrix[self.lines][:, self.columns].tocsr()
+        self.line_scale = np.ones(len(self.lines))
+        self.column_scale = np.ones(len(self.columns))
+        if scale and matrix.nnz > 0:
+            self.define_scale(matrix, scale_passes)
+        matrix = scipy.sparse.diags(self.line_sign * self.line_scale) @ matrix @ scipy.sparse.diags(self.column_scale)
+        self.matrix_problem = self.build_problem(matrix.tocsr(), config[0])
+        self.define_names()
+
+    def reduce(self) -> None:
+        changed = True
+        while changed and not self.infeasible:
+            lines = np.flatnonzero(self.active_lines)
+            columns = np.flatnonzero(self.active_columns)
+            matrix = self.matrix[lines][:, columns].tocsr()
+            changed = self.remove_empty_lines(lines, matrix)
+            changed = self.remove_singleton_lines(lines, columns, matrix) or changed
+            changed = self.remove_empty_columns(columns, matrix) or changed
+            if not changed and not self.infeasible:
+                changed = self.remove_duplicate_lines(lines, matrix)
+
+    def remove_empty_lines(self, lines, matrix) -> bool:
+        empty = lines[np.diff(matrix.indptr) == 0]
+        for i in empty:
+            kind, b = self.kinds[i], self.b[i]
+            if (kind == 1 and b < -TOLERANCE) or (kind == 2 and b > TOLERANCE) or (kind == 3 and abs(b) > TOLERANCE):
+                self.infeasible = True
+            self.remove_line(i, 'empty_lines')
+        return len(empty) > 0
+
+    # a singleton equality fixes its variable; a singleton inequality is a
+    # bound, removed only when it is redundant or pins the variable at zero
+    def remove_singleton_lines(self, lines, columns, matrix) -> bool:
+        changed = False
+        for position in np.flatnonzero(np.diff(matrix.indptr) == 1):
+            i = lines[position]
+            j = columns[matrix.indices[matrix.indptr[position]]]
+            if not self.active_columns[j]:
+                continue
+            a, b = matrix.data[matrix.indptr[position]], self.b[i]
+            if self.kinds[i] == 3:
+                value = b / a
+                if value < -TOLERANCE:
+                    self.infeasible = True
+                self.fix_variable(j, max(value, 0.0))
+                self.remove_line(i, 'singleton_lines', j)
+                changed = True
+                continue
+            if self.kinds[i] == 2:
+                a, b = -a, -b
+            if a > 0 and b / a < -TOLERANCE:
+                self.infeasible = True
+            elif a > 0 and b / a <= TOLERANCE:
+                self.fix_variable(j, 0.0)
+            elif a > 0 or b / a > TOLERANCE:
+                continue
+            self.remove_line(i, 'singleton_lines')
+            changed = True
+        return changed
+
+    # an empty column whose cost can't improve z stays at zero; an improving
+    # one is kept so the simplex reports the problem unbounded
+    def remove_empty_columns(self, columns, matrix) -> bool:
+        counts = np.bincount(matrix.indices, minlength=len(columns))
+        sign = 1 if self.fo_min else -1
+        empty = columns[(counts == 0) & (sign * self.cost[columns] >= 0)]
+        for j in empty:
+            self.active_columns[j] = False
+            self.fixed[j] = 0.0
+            self.removed['empty_columns'] += 1
+        return len(empty) > 0
+
+    # lines with proportional coefficients collapse to the tightest ones
+    def remove_duplicate_lines(self, lines, matrix) -> bool:
+        groups = {}
+        for position, i in enumerate(lines):
+            start, end = matrix.indptr[position], matrix.indptr[position + 1]
+            factor = np.max(np.abs(matrix.data[start:end]))
+            key = (matrix.indices[start:end].tobytes(), np.round(matrix.data[start:end] / factor, 12).tobytes())
+            groups.setdefault(key, []).append((i, self.b[i] / factor))
+        changed = False
+        for group in groups.values():
+            if len(group) == 1:
+                continue
+            upper = [(b, i) for i, b in group if self.kinds[i] in (1, 3)]
+            lower = [(b, i) for i, b in group if self.kinds[i] in (2, 3)]
+            if upper and lower and max(lower)[0] > min(upper)[0] + TOLERANCE:
+                self.infeasible = True
+            keep = [i for i, b in group if self.kinds[i] == 3][:1]
+            if not keep:
+                keep = [min(upper)[1]] if upper else []
+                keep += [max(lower)[1]] if lower else []
+            for i, b in group:
+                if i not in keep:
+                    self.remove_line(i, 'duplicate_lines')
+                    changed = True
+        return changed
+
+    def remove_line(self, i, reason, basic=None) -> None:
+        self.active_lines[i] = False
+        self.line_basic[i] = basic
+        self.removed[reason] += 1
+
+    def fix_variable(self, j, value) -> None:
+        self.active_columns[j] = False
+        self.fixed[j] = value
+        self.b -= value * self.matrix[:, [j]].toarray().ravel()
+        self.offset += self.cost[j] * value
+        self.removed['fixed_variables'] += 1
+
+    # geometric-mean passes followed by equilibration, rounded to powers of
+    # two so scaling adds no rounding error
+    def define_scale(self, matrix, passes) -> None:
+        line_scale = np.ones(matrix.shape[0])
+        column_scale = np.ones(matrix.shape[1])
+        for _ in range(passes):
+            scaled = scipy.sparse.diags(line_scale) @ matrix @ scipy.sparse.diags(column_scale)
+            smallest, largest = line_extremes(scaled.tocsr())
+            line_scale /= np.sqrt(smallest * largest)
+            scaled = scipy.sparse.diags(line_scale) @ matrix @ scipy.sparse.diags(column_scale)
+            smallest, largest = line_extremes(scaled.tocsc())
+            column_scale /= np.sqrt(smallest * largest)
+        scaled = scipy.sparse.diags(line_scale) @ matrix @ scipy.sparse.diags(column_scale)
+        line_scale /= line_extremes(scaled.tocsr())[1]
+        scaled = scipy.sparse.diags(line_scale) @ matrix @ scipy.sparse.diags(column_scale)
+        column_scale /= line_extremes(scaled.tocsc())[1]
+        self.line_scale = np.exp2(np.round(np.log2(line_scale)))
+        self.column_scale = np.exp2(np.round(np.log2(column_scale)))
+
+    def build_problem(self, matrix, fo_config):
+        top = np.concatenate([[fo_config], self.cost[self.columns] * self.column_scale, [self.constant]])
+        config = self.line_kinds.astype(float)[:, None]
+        b = (self.line_sign * self.b[self.lines] * self.line_scale)[:, None]
+        if self.sparse:
+            body = scipy.sparse.hstack([config, matrix, b])
+            return scipy.sparse.vstack([top[None, :], body]).tocsr()
+        return np.vstack([top, np.hstack([config, matrix.toarray(), b])])
+
+    # original slack/surplus and artificial names of every line, and the
+    # original line of every reduced slack and artificial (a negated <= line
+    # gains an artificial with no original name)
+    def define_names(self) -> None:
+        logical = np.isin(self.kinds, (1, 2))
+        artificial = np.isin(self.kinds, (2, 3))
+        self.slack_names = {i: f'xf{k}' for k, i in enumerate(np.flatnonzero(logical))}
+        self.artificial_names = {i: f'a{k}' for k, i in enumerate(np.flatnonzero(artificial))}
+        positions = np.arange(len(self.lines))
+        self.slack_lines = positions[logical[self.lines]]
+        self.artificial_lines = positions[np.isin(self.line_kinds, (2, 3))]
+
+    # maps a basic-variable dict of the reduced problem to the original names
+    # and scale, then adds the variables left basic by the removed lines; a
+    # negated line's slack or surplus keeps its value (b - Ax turns into
+    # -Ax + b), so only the scale is undone
+    def postsolve_vb(self, vb) -> dict:
+        x = np.zeros(len(self.active_columns))
+        for j, value in self.fixed.items():
+            x[j] = value
+        original = {}
+        for name, value in vb.items():
+            if name.startswith('xf'):
+                position = self.slack_lines[int(name[2:])]
+                original[self.slack_names[self.lines[position]]] = value / self.line_scale[position]
+            elif name.startswith('a'):
+                position = self.artificial_lines[int(name[1:])]
+                if self.lines[position] in self.artificial_names:
+                    original[self.artificial_names[self.lines[position]]] = value / self.line_scale[position]
+            else:
+                k = int(name[1:])
+                x[self.columns[k]] = value * self.column_scale[k]
+                original[f'x{self.columns[k]}'] = x[self.columns[k]]
+        activity = self.matrix @ x
+        for i, j in self.line_basic.items():
+            if j is not None:
+                original[f'x{j}'] = x[j]
+            elif self.kinds[i] == 1:
+                original[self.slack_names[i]] = self.original_b[i] - activity[i]
+            elif self.kinds[i] == 2:
+                original[self.slack_names[i]] = activity[i] - self.original_b[i]
+            else:
+                original[self.artificial_names[i]] = abs(activity[i] - self.original_b[i])
+        return OrderedDict(sorted(original.items()))
+
+    def postsolve_z(self, z) -> float:
+        return z + self.offset
+
+    def get_report(self) -> dict:
+        report = OrderedDict([
+            ('lines', len(self.active_lines)),
+            ('columns', len(self.active_columns)),
+            ('reduced_lines', len(self.lines)),
+            ('reduced_columns', len(self.columns)),
+        ])
+        report.update(self.removed)
+        report['infeasible'] = self.infeasible
+        return report
+
+
+# smallest and largest absolute nonzero of each line of a CSR matrix (each
+# column of a CSC one); empty lines report 1 so they are left unscaled
+def line_extremes(matrix):
+    counts = np.diff(matrix.indptr)
+    smallest = np.ones(len(counts))
+    largest = np.ones(len(counts))
+    nonempty = counts > 0
+    if np.any(nonempty):
+        values = np.abs(matrix.data)
+        starts = matrix.indptr[:-1][nonempty]
+        smallest[nonempty] = np.minimum.reduceat(values, starts)
+        largest[nonempty] = np.maximum.reduceat(values, starts)
+    return smallest, largest
@@ -0,0 +1,138 @@
+import json
+import time
+from collections import OrderedDict
+
+from simplex import Observer
+
+# instance methods timed per engine, as (owner attribute path, method, stage)
+TABLEAU_STAGES = [
+    ('kernel', 'reduced_costs', 'pricing'),
+    ('pricing', 'select', 'pricing'),
+    ('pricing', 'update', 'pricing'),
+    ('', 'define_pivot_line', 'ratio_test'),
+    ('kernel', 'pivot', 'pivot'),
+    ('', 'get_algorithm', 'history'),
+    ('algorithms', 'next_matrix', 'history'),
+    ('algorithms', 'store', 'history'),
+]
+REVISED_STAGES = [
+    ('revised', 'pricing_line', 'pricing'),
+    ('pricing', 'select', 'pricing'),
+    ('pricing', 'update', 'pricing'),
+    ('revised', 'define_pivot_line', 'ratio_test'),
+    ('revised', 'pivot', 'pivot'),
+    ('revised.factor', 'ftran', 'factor'),
+    ('revised.factor', 'btran', 'factor'),
+    ('revised.factor', 'update', 'factor'),
+    ('revised', 'refactor', 'refactor'),
+]
+
+
+# Observer that times the solver stages, counts degenerate pivots and
+# samples z every sample_interval pivots. Stage times are exclusive: time
+# spent in a nested timed call (a btran inside pricing_line, say) goes to
+# that call's stage only. Timing wraps the methods of the attached simplex,
+# so a simplex without a Profiler runs untouched.
+class Profiler(Observer):
+
+    def __init__(self, sample_interval=1):
+        self.sample_interval = sample_interval
+        self.stages = OrderedDict()
+        self.nested = []
+        self.phases = []
+        self.progress = []
+        self.degenerate_pivots = 0
+        self.iterations = 0
+        self.history_bytes = 0
+        self.start = None
+        self.phase_started = None
+
+    def attach(self, simplex) -> None:
+        self.start = time.perf_counter()
+        self.wrap_stages(simplex)
+
+    # the engine, its factor and the pricing rule can be replaced during a
+    # solve (Bland fallback, refactor, reoptimize), so new ones are wrapped
+    # at every phase start and whenever the pricing rule changes
+    def wrap_stages(self, simplex) -> None:
+        for path, name, stage in TABLEAU_STAGES if simplex.revised is None else REVISED_STAGES:
+            owner = simplex
+            for attribute in filter(None, path.split('.')):
+                owner = getattr(owner, attribute)
+            if not getattr(getattr(owner, name), 'profiled', False):
+                setattr(owner, name, self.timed(getattr(owner, name), stage))
+
+    def timed(self, method, stage):
+        entry = self.stages.setdefault(stage, {'time': 0.0, 'calls': 0})
+
+        def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            self.nested.append(0.0)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                entry['time'] += elapsed - self.nested.pop()
+                entry['calls'] += 1
+                if self.nested:
+                    self.nested[-1] += elapsed
+
+        timed_method.profiled = True
+        return timed_method
+
+    def phase_start(self, simplex, phase) -> None:
+        self.wrap_stages(simplex)
+        self.phase_started = (time.perf_counter(), simplex.iterations)
+        self.sample(simplex)
+
+    def iteration(self, simplex) -> None:
+        self.iterations += 1
+        if simplex.degenerate_pivots > 0:
+            self.degenerate_pivots += 1
+        if not getattr(simplex.pricing.select, 'profiled', False):
+            self.wrap_stages(simplex)
+        if self.iterations % self.sample_interval == 0:
+            self.sample(simplex)
+
+    def phase_end(self, simplex, phase, status) -> None:
+        start, iterations = self.phase_started
+        self.phases.append(OrderedDict([
+            ('phase', phase),
+            ('status', status),
+            ('iterations', simplex.iterations - iterations),
+            ('time', time.perf_counter() - start),
+        ]))
+        self.sample(simplex)
+        self.history_bytes = max(self.history_bytes, simplex.algorithms.nbytes())
+
+    # (elapsed seconds, iterations, z) of the current basis; z carries the
+    # Big-M or Phase I penalty until the artificials leave
+    def sample(self, simplex) -> None:
+        point = (time.perf_counter() - self.start, simplex.iterations, float(simplex.get_z()))
+        if not self.progress or self.progress[-1][1] != point[1]:
+            self.progress.append(point)
+
+    def get_report(self) -> dict:
+        stages = OrderedDict()
+        for stage, entry in self.stages.items():
+            stages[stage] = OrderedDict([
+                ('time', entry['time']),
+                ('calls', entry['calls']),
+                ('time_per_call', entry['time'] / entry['calls'] if entry['calls'] else 0.0),
+            ])
+        return OrderedDict([
+            ('time', sum(phase['time'] for phase in self.phases)),
+            ('iterations', self.iterations),
+            ('degenerate_pivots', self.degenerate_pivots),
+            ('history_bytes', self.history_bytes),
+            ('stages', stages),
+            ('phases', self.phases),
+            ('progress', [OrderedDict(zip(('time', 'iteration', 'z'), point)) for point in self.progress]),
+        ])
+
+    def to_json(self, indent=None) -> str:
+        return json.dumps(self.get_report(), indent=indent)
+
+    def save(self, path) -> None:
+        with open(path, 'w') as file:
+            file.write(self.to_json(indent=2))
@@ -1,24 +1,91 @@
+import time
 import numpy as np
 from collections import OrderedDict
+import scipy.sparse
+from scipy.linalg import lu_factor, lu_solve
+from scipy.linalg.blas import dger
+from scipy.sparse.linalg import splu
+
+from presolve import Presolve
+
+EPSILON = 1e-9
+FEASIBILITY_TOLERANCE = 1e-7
+
+OPTIMAL = 'optimal'
+UNBOUNDED = 'unbounded'
+INFEASIBLE = 'infeasible'
+ITERATION_LIMIT = 'iteration_limit'
+TIME_LIMIT = 'time_limit'
+CANCELLED = 'cancelled'
+BATCH_STATUS = [None, OPTIMAL, UNBOUNDED, INFEASIBLE, ITERATION_LIMIT, TIME_LIMIT]
 
 
 class Simplex:
 
-    def __init__(self, matrix_problem, fo_min=False):
+    def __init__(self, matrix_problem, fo_min=False, engine='tableau', history='full', checkpoint_interval=10,
+                 cache_size=8, pricing='dantzig', stall_limit=50, sparse=None, method='big_m', presolve=False,
+                 observers=()):
+        self.fo_min = False
+        self.a_value = 0
+        if method not in ('big_m', 'two_phase'):
+            raise Exception("Invalid method")
+        self.method = method
+        self.phase = 2
+        self.objective_line = None
+        self.barred = None
+        self.dropped = np.zeros(0, dtype=int)
+        self.presolve = None
+        if presolve:
+            self.presolve = Presolve(matrix_problem)
+            matrix_problem = self.presolve.matrix_problem
+        self.read_layout(matrix_problem)
+        self.algorithms = History(history, checkpoint_interval, cache_size)
+        self.kernel = PivotKernel()
+        self.pricing = make_pricing(pricing)
+        self.stall_limit = stall_limit
+        self.degenerate_pivots = 0
+        self.iterations = 0
+        self.status = None
+        self.cancelled = False
+        self.basis = np.zeros(self.num_rest, dtype=int)
+        self.nonbasic = None
+        self.revised = None
+        self.problem_copied = False
+        self.observers = []
+        # presolve may settle the problem (infeasible, or no lines left), and
+        # then there is nothing to build
+        self.settled = self.presolve is not None and (self.presolve.infeasible or self.num_rest == 0)
+        if engine not in ('tableau', 'revised'):
+            raise Exception("Invalid engine")
+        if engine == 'revised' and not self.settled:
+            sparse = is_sparse(matrix_problem) if sparse is None else sparse
+            self.revised = RevisedSimplex(self, matrix_problem[:, 1:], sparse)
+        elif not self.settled:
+            if is_sparse(matrix_problem):
+                matrix_problem = matrix_problem.toarray()
+                self.problem_copied = True
+            matrix = self.generate_matrix()
+            self.define_initial_algorithm(matrix_problem[:, 1:], matrix)
+            self.algorithms.append(matrix, self.basis)
+        self.matrix_problem = matrix_problem
+        for observer in observers:
+            self.add_observer(observer)
+
+    def add_observer(self, observer) -> None:
+        self.observers.append(observer)
+        observer.attach(self)
+
+    def read_layout(self, matrix_problem) -> None:
         mp_num_line, mp_num_column = matrix_problem.shape
         self.num_var = mp_num_column - 2
         self.num_rest = mp_num_line - 1
-        self.fo_min = False
         self.xf = []
         self.n_xf = []
         self.a = []
-        self.a_value = 0
-        self.read_config_column(matrix_problem[:, 0])
+        self.read_config_column(dense_column(matrix_problem, 0))
         self.num_lines = self.num_rest + 1
         self.num_columns = self.num_var + len(self.xf) + len(self.n_xf) + len(self.a) + 1
-        self.algorithms = []
-        self.generate_matrix()
-        self.define_initial_algorithm(matrix_problem[:, 1:])
+        self.names = self.variable_names()
 
     # 1 --> < || <=
     # 2 --> > || >=
@@ -38,26 +105,33 @@ class Simplex:
             else:
                 raise Exception("Invalid element in config line")
 
-    def generate_matrix(self) -> None:
-        self.algorithms.append(np.zeros([self.num_lines, self.num_columns]))
+    def generate_matrix(self):
+        return np.zeros([self.num_lines, self.num_columns])
 
     def get_algorithm(self, index=-1):
+        if self.revised is not None:
+            return self.revised.get_tableau()
         return self.algorithms[index]
 
     def get_copy(self):
         return np.copy(self.get_algorithm())
 
+    def first_artificial(self) -> int:
+        return self.num_var + len(self.xf) + len(self.n_xf)
+
     def define_fo_line(self, line, matrix) -> None:
         matrix[0][:self.num_var] = line[:-1]
-        if len(self.a) == 0:
+        if len(self.a) == 0 or self.method == 'two_phase':
             matrix[0] = np.negative(matrix[0])
         matrix[0][-1] = line[-1]
+        if self.method == 'two_phase':
+            self.objective_line = np.copy(matrix[0])
+            return
         for i in range(0, len(self.a)):
             self.a_value = max(x for x in matrix[0][:self.num_var]) * 10000
             matrix[0][self.num_var + len(self.xf) + len(self.n_xf) + i] = self.a_value * (1 if self.fo_min else -1)
 
-    def define_initial_algorithm(self, matrix_problem) -> None:
-        matrix = self.get_algorithm()
+    def define_initial_algorithm(self, matrix_problem, matrix) -> None:
         self.define_fo_line(matrix_problem[0, :], matrix)
 
         for i, line in enumerate(matrix[1:], 1):
@@ -69,22 +143,77 @@ class Simplex:
         for i, line in enumerate(matrix[1:, self.num_var:-1], 1):
             if i in self.xf:
                 line[control_column[0]] = 1
+                self.basis[i - 1] = self.num_var + control_column[0]
                 control_column[0] += 1
             elif i in self.n_xf:
                 line[control_column[0]] = -1
                 control_column[0] += 1
             if i in self.a:
                 line[len(self.n_xf) + len(self.xf) + control_column[1]] = 1
+                self.basis[i - 1] = self.num_var + len(self.n_xf) + len(self.xf) + control_column[1]
                 control_column[1] += 1
             matrix[i, self.num_var:-1] = line
+        self.define_nonbasic(self.num_columns - 1)
 
-    def execute(self) -> None:
-        if len(self.a) > 0:
+    # callback(simplex) runs after every pivot (like Observer.iteration);
+    # cancel() from another thread stops the solve at the next one
+    def execute(self, max_iterations=None, time_limit=None, callback=None) -> str:
+        if self.settled:
+            if self.presolve.infeasible:
+                self.status = INFEASIBLE
+            else:
+                self.status = UNBOUNDED if self.num_var > 0 else OPTIMAL
+            return self.status
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        engine = self if self.revised is None else self.revised
+        if len(self.a) > 0 and self.method == 'two_phase':
+            engine.start_phase_one()
+            if self.zero_fo_vars(max_iterations, deadline, callback=callback) != OPTIMAL:
+                return self.status
+            engine.start_phase_two()
+        elif self.revised is None and len(self.a) > 0:
             self.zero_fo_a()
-        self.zero_fo_vars()
+        return self.zero_fo_vars(max_iterations, deadline, callback=callback)
+
+    # Phase I minimizes the sum of the artificials
+    def start_phase_one(self) -> None:
+        self.phase = 1
+        matrix = self.algorithms.next_matrix()
+        matrix[0] = 0
+        matrix[0, self.first_artificial():-1] = -1
+        matrix[0] += matrix[self.a].sum(axis=0)
+        self.algorithms.append(matrix, self.basis)
+
+    # Artificials still basic at zero level are pivoted out when their line
+    # has a usable coefficient, otherwise the line is redundant and dropped.
+    # Then the artificial columns go away and the real objective is priced out.
+    def start_phase_two(self) -> None:
+        first_artificial = self.first_artificial()
+        self.pivot_out_artificials(np.flatnonzero(self.basis >= first_artificial))
+        redundant = np.flatnonzero(self.basis >= first_artificial)
+        self.dropped = self.basis[redundant]
+        self.basis = np.delete(self.basis, redundant)
+        matrix = np.delete(self.get_algorithm(), redundant + 1, axis=0)
+        matrix = np.delete(matrix, np.s_[first_artificial:-1], axis=1)
+        matrix[0, :-1] = self.objective_line[:first_artificial]
+        matrix[0, -1] = self.objective_line[-1]
+        matrix[0] -= matrix[0, self.basis] @ matrix[1:]
+        self.define_nonbasic(first_artificial)
+        self.algorithms.append(matrix, self.basis)
+        self.phase = 2
+
+    # each basic artificial at these positions leaves on the first
+    # non-artificial column with a usable coefficient in its line, if any
+    def pivot_out_artificials(self, positions) -> None:
+        first_artificial = self.first_artificial()
+        for position in positions:
+            line = self.get_algorithm()[position + 1, :first_artificial]
+            candidates = np.flatnonzero(np.abs(line) > EPSILON)
+            if len(candidates) > 0:
+                self.generate_new_algorithm(position + 1, candidates[0])
 
     def zero_fo_a(self) -> None:
-        matrix = self.get_copy()
+        matrix = self.algorithms.next_matrix()
         m_line = 0
         for i in self.a:
             if self.fo_min:
@@ -94,75 +223,1121 @@ class Simplex:
                 m_line -= matrix[i] * self.a_value
         m_line -= matrix[0]
         matrix[0] = m_line
-        self.algorithms.append(matrix)
+        self.algorithms.append(matrix, self.basis)
 
-    def zero_fo_vars(self) -> None:
-        i = 10000000
-        while i > 0:
-            matrix = self.get_algorithm()
-            if self.fo_min:
-                if not np.any(matrix[0][:-1] > 0):
-                    break
-                pivot_var_fo = max(matrix[0][:-1])
+    # observers hear phase_start/phase_end around each run and iteration
+    # after each pivot, alongside callback
+    def zero_fo_vars(self, max_iterations=None, deadline=None, dual=False, callback=None) -> str:
+        engine = self if self.revised is None else self.revised
+        phase = 'dual' if dual else ('phase_one' if self.phase == 1 else 'phase_two')
+        for observer in self.observers:
+            observer.phase_start(self, phase)
+        engine.reset_pricing()
+        iterate = engine.dual_iterate if dual else engine.iterate
+        hooks = [observer.iteration for observer in self.observers]
+        if callback is not None:
+            hooks.append(callback)
+        self.status = None
+        while self.status is None:
+            if self.cancelled:
+                self.status = CANCELLED
+            elif max_iterations is not None and self.iterations >= max_iterations:
+                self.status = ITERATION_LIMIT
+            elif deadline is not None and time.perf_counter() >= deadline:
+                self.status = TIME_LIMIT
             else:
-                if not np.any(matrix[0][:-1] < 0):
-                    break
-                pivot_var_fo = min(matrix[0][:-1])
+                self.status = iterate()
+                if self.status is None:
+                    for hook in hooks:
+                        hook(self)
+        for observer in self.observers:
+            observer.phase_end(self, phase, self.status)
+        return self.status
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def editable_problem(self):
+        if self.presolve is not None:
+            raise Exception("A presolved problem can't be edited")
+        if not self.problem_copied:
+            self.matrix_problem = self.matrix_problem.copy()
+            self.problem_copied = True
+        if is_sparse(self.matrix_problem):
+            self.matrix_problem = self.matrix_problem.tolil()
+        return self.matrix_problem
+
+    # line is the matrix_problem line (1 for the first constraint)
+    def update_b(self, line, value) -> None:
+        self.editable_problem()[line, -1] = value
+
+    # column is the variable index (0 for x0)
+    def update_c(self, column, value) -> None:
+        self.editable_problem()[0, column + 1] = value
+
+    def add_constraint(self, coefficients, config, value) -> None:
+        line = np.concatenate([[config], coefficients, [value]])[None, :]
+        if is_sparse(self.matrix_problem):
+            self.matrix_problem = scipy.sparse.vstack([self.matrix_problem, line]).tolil()
+        else:
+            self.matrix_problem = np.vstack([self.matrix_problem, line])
+        self.problem_copied = True
 
-            pivot_column_index = np.argmax(matrix[0] == pivot_var_fo)
-            pivot_line_index = self.define_pivot_line(pivot_column_index, matrix)
-            self.generate_new_algorithm(pivot_line_index, pivot_column_index)
-            i -= 1
+    # coefficients has one entry per constraint line
+    def add_variable(self, coefficients, cost) -> None:
+        column = np.concatenate([[cost], coefficients])[:, None]
+        problem = self.matrix_problem
+        if is_sparse(problem):
+            problem = problem.tocsc()
+            self.matrix_problem = scipy.sparse.hstack([problem[:, :-1], column, problem[:, -1:]]).tolil()
+        else:
+            self.matrix_problem = np.hstack([problem[:, :-1], column, problem[:, -1:]])
+        self.problem_copied = True
+
+    # Re-solves the edited problem from the current basis: dual simplex while
+    # the warm basis is primal infeasible (with negative reduced costs shifted
+    # to zero meanwhile), then primal simplex for any dual infeasibility
+    def reoptimize(self, max_iterations=None, time_limit=None, callback=None) -> str:
+        basic = self.get_basic_names()
+        self.read_layout(self.matrix_problem)
+        return self.warm_execute(basic, max_iterations, time_limit, callback)
+
+    # basic holds the basic variable names (one per line, as get_basic_names
+    # returns them) of this problem or of an earlier one with fewer lines;
+    # the lines past len(basic) start with their own logical variable basic
+    def warm_execute(self, basic, max_iterations=None, time_limit=None, callback=None) -> str:
+        if self.presolve is not None:
+            raise Exception("A presolved problem can't be warm started")
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        old_num_rest = len(basic)
+        index = {name: j for j, name in enumerate(self.variable_names())}
+        self.phase = 2
+        self.dropped = np.zeros(0, dtype=int)
+        if self.revised is not None:
+            self.revised = RevisedSimplex(self, self.matrix_problem[:, 1:], self.revised.sparse,
+                                          self.revised.refactor_interval)
+        engine = self if self.revised is None else self.revised
+        engine.warm_start([index[name] for name in basic], old_num_rest)
+        if not engine.primal_feasible():
+            shifted = engine.shift_costs()
+            if self.zero_fo_vars(max_iterations, deadline, dual=True, callback=callback) != OPTIMAL:
+                return self.status
+            if shifted:
+                engine.restore_costs()
+        return self.zero_fo_vars(max_iterations, deadline, callback=callback)
+
+    # New lines keep their slack (or surplus/artificial) basic. A basic
+    # artificial with a positive value has its line and column negated so the
+    # dual simplex drives it out; one at zero level is pivoted out as in
+    # start_phase_two, so no primal pivot can raise it. Artificials outside
+    # the basis are barred, and swap_basis bars each one that leaves later.
+    def warm_start(self, basis, old_num_rest) -> None:
+        matrix = self.generate_matrix()
+        self.basis = np.zeros(self.num_rest, dtype=int)
+        self.define_initial_algorithm(self.matrix_problem[:, 1:], matrix)
+        self.basis = np.concatenate([basis, self.basis[old_num_rest:]]).astype(int)
+        self.define_nonbasic(self.num_columns - 1)
+        matrix[1:] = np.linalg.solve(matrix[1:, self.basis], matrix[1:])
+        first_artificial = self.first_artificial()
+        for position in np.flatnonzero(self.basis >= first_artificial):
+            if matrix[position + 1, -1] > FEASIBILITY_TOLERANCE:
+                matrix[position + 1] *= -1
+                matrix[:, self.basis[position]] *= -1
+        self.define_objective(matrix)
+        self.algorithms.append(matrix, self.basis)
+        values = matrix[1:, -1]
+        self.pivot_out_artificials(np.flatnonzero((self.basis >= first_artificial)
+                                                  & (np.abs(values) <= FEASIBILITY_TOLERANCE)))
+        self.barred = np.setdiff1d(np.arange(first_artificial, self.num_columns - 1), self.basis)
+
+    def define_objective(self, matrix) -> None:
+        matrix[0] = 0
+        matrix[0, :self.num_var] = -self.matrix_problem[0, 1:-1]
+        matrix[0, -1] = self.matrix_problem[0, -1]
+        matrix[0] -= matrix[0, self.basis] @ matrix[1:]
+
+    def primal_feasible(self) -> bool:
+        return bool(np.all(self.get_algorithm()[1:, -1] >= -FEASIBILITY_TOLERANCE))
+
+    def shift_costs(self) -> bool:
+        matrix = self.algorithms.next_matrix()
+        reduced_costs = self.kernel.reduced_costs(matrix, self.fo_min)
+        shifted = reduced_costs < 0
+        matrix[0, :-1][shifted] = 0
+        self.algorithms.append(matrix, self.basis)
+        return bool(np.any(shifted))
+
+    def restore_costs(self) -> None:
+        matrix = self.algorithms.next_matrix()
+        self.define_objective(matrix)
+        self.algorithms.append(matrix, self.basis)
+
+    def dual_iterate(self):
+        matrix = self.get_algorithm()
+        bland = self.pricing.bland
+        pivot_line_index = dual_pivot_line(matrix[1:, -1], self.basis, bland) + 1
+        if pivot_line_index == 0:
+            return OPTIMAL
+        reduced_costs = np.maximum(self.kernel.reduced_costs(matrix, self.fo_min), 0)
+        pivot_column_index = dual_ratio_test(matrix[pivot_line_index, :-1], reduced_costs, self.barred, bland)
+        if pivot_column_index < 0:
+            return INFEASIBLE
+        degenerate = reduced_costs[pivot_column_index] <= EPSILON
+        self.generate_new_algorithm(pivot_line_index, pivot_column_index)
+        self.register_pivot(degenerate)
+        return None
+
+    def reset_pricing(self) -> None:
+        matrix = self.get_algorithm()
+        column_norms = 1 + np.sum(matrix[1:, :-1] ** 2, axis=0) if self.pricing.needs_cross else None
+        self.pricing.reset(matrix.shape[1] - 1, column_norms)
+
+    def iterate(self):
+        matrix = self.get_algorithm()
+        reduced_costs = self.kernel.reduced_costs(matrix, self.fo_min or self.phase == 1)
+        if self.barred is not None:
+            reduced_costs[self.barred] = 0
+        pivot_column_index = self.pricing.select(reduced_costs)
+        if pivot_column_index < 0:
+            return self.final_status(matrix[1:, -1])
+        pivot_line_index = self.define_pivot_line(pivot_column_index, matrix)
+        if pivot_line_index < 0:
+            return UNBOUNDED
+        if self.pricing.needs_line:
+            column = matrix[1:, pivot_column_index]
+            cross = matrix[1:, :-1].T @ column if self.pricing.needs_cross else None
+            self.pricing.update(pivot_column_index, matrix[pivot_line_index, :-1], column[pivot_line_index - 1], cross)
+        degenerate = matrix[pivot_line_index, -1] <= EPSILON
+        self.generate_new_algorithm(pivot_line_index, pivot_column_index)
+        self.register_pivot(degenerate)
+        return None
+
+    def final_status(self, values) -> str:
+        artificial = self.basis >= self.first_artificial()
+        if np.any(values[artificial] > FEASIBILITY_TOLERANCE):
+            return INFEASIBLE
+        return OPTIMAL
+
+    # consecutive degenerate pivots beyond stall_limit switch to Bland's rule,
+    # which cannot cycle
+    def register_pivot(self, degenerate) -> None:
+        self.iterations += 1
+        self.degenerate_pivots = self.degenerate_pivots + 1 if degenerate else 0
+        if self.degenerate_pivots >= self.stall_limit and not self.pricing.bland:
+            self.pricing = BlandPricing()
 
     def define_pivot_line(self, pivot_column_index, matrix) -> int:
-        pivot_div_val = 0
-        pivot_line_index = 0
-        for i in range(1, self.num_lines):
-            if matrix[i][pivot_column_index] != 0:
-                res = matrix[i][-1] / matrix[i][pivot_column_index]
-                if (res < pivot_div_val or pivot_div_val == 0) and res > 0:
-                    pivot_div_val = res
-                    pivot_line_index = i
-        return pivot_line_index
+        return self.kernel.pivot_line(matrix, pivot_column_index, self.basis if self.pricing.bland else None)
 
     def generate_new_algorithm(self, pivot_line_index, pivot_column_index) -> None:
-        matrix = self.get_copy()
-        pivot = matrix[pivot_line_index][pivot_column_index]
-        matrix[pivot_line_index] /= pivot
-        new_pivot_line = matrix[pivot_line_index]
-        for i, line in enumerate(matrix):
-            if i == pivot_line_index:
-                continue
-            line = (-line[pivot_column_index] * new_pivot_line) + line
-            matrix[i] = line
-        self.algorithms.append(matrix)
+        matrix = self.algorithms.next_matrix()
+        self.kernel.pivot(matrix, pivot_line_index, pivot_column_index)
+        self.swap_basis(pivot_line_index - 1, pivot_column_index)
+        self.algorithms.append_pivot(matrix, pivot_line_index, pivot_column_index, self.basis)
+
+    def define_nonbasic(self, num_columns) -> None:
+        self.nonbasic = np.ones(num_columns, dtype=bool)
+        self.nonbasic[self.basis] = False
+
+    # position is the basis index (tableau line - 1)
+    def swap_basis(self, position, column) -> None:
+        engine = self if self.revised is None else self.revised
+        if engine.barred is not None and self.basis[position] >= self.first_artificial():
+            engine.barred = np.union1d(engine.barred, self.basis[position])
+        self.nonbasic[self.basis[position]] = True
+        self.nonbasic[column] = False
+        self.basis[position] = column
 
     def get_vb(self, index=-1) -> dict:
-        vb = {}
-        matrix = self.get_algorithm(index)
-        for line in matrix:
-            for i, v in enumerate(line):
-                if v == 1:
-                    if i < self.num_var:
-                        key = f'x{i}'
-                    elif i < self.num_var + len(self.xf) + len(self.n_xf):
-                        key = f'xf{i - self.num_var}'
-                    else:
-                        key = f'a{i-self.num_var - len(self.xf) - len(self.n_xf)}'
-                    vb[key] = line[-1]
-        vb = OrderedDict(sorted(vb.items()))
+        if self.settled:
+            vb = {}
+        elif self.revised is not None:
+            vb = self.revised.get_vb()
+        else:
+            values = self.get_algorithm(index)[1:, -1]
+            basis = self.algorithms.get_basis(index)
+            vb = dict(zip([self.names[j] for j in basis], values))
+            # steps after phase two lack the redundant lines, whose
+            # artificials stay basic at zero as in the revised engine
+            if len(basis) < self.num_rest:
+                vb.update((self.names[j], 0.0) for j in self.dropped)
+            vb = OrderedDict(sorted(vb.items()))
+        if self.presolve is not None:
+            vb = self.presolve.postsolve_vb(vb)
         return vb
 
-    def get_header(self) -> list:
-        header = []
+    # basis of the current step as variable names, artificials dropped with
+    # a redundant line included, ready for warm_execute
+    def get_basic_names(self) -> list:
+        return [self.names[j] for j in np.concatenate([self.basis, self.dropped])]
+
+    def variable_names(self) -> list:
+        names = []
         for i in range(self.num_var):
-            header.append(f'x{i}')
+            names.append(f'x{i}')
         for i in range(len(self.xf) + len(self.n_xf)):
-            header.append(f'xf{i}')
+            names.append(f'xf{i}')
         for i in range(len(self.a)):
-            header.append(f'a{i}')
-        header.append('b')
-        return header
+            names.append(f'a{i}')
+        return names
+
+    def get_header(self, index=-1) -> list:
+        if self.revised is None and self.get_algorithm(index).shape[1] < self.num_columns:
+            return self.names[:self.first_artificial()] + ['b']
+        return self.names + ['b']
 
     def get_z(self, index=-1) -> float:
-        return self.get_algorithm(index)[0][-1]
+        if self.settled:
+            z = dense_column(self.matrix_problem, -1)[0]
+        elif self.revised is not None:
+            z = self.revised.get_z()
+        else:
+            z = self.get_algorithm(index)[0][-1]
+        if self.presolve is not None:
+            z = self.presolve.postsolve_z(z)
+        return z
+
+    # structural, slack/surplus and artificial columns of the constraint lines,
+    # in tableau column order
+    def constraint_matrix(self):
+        if self.revised is not None:
+            return self.revised.full_matrix()
+        matrix = np.zeros([self.num_rest, self.num_columns - 1])
+        problem = self.matrix_problem[1:, 1:-1]
+        matrix[:, :self.num_var] = problem.toarray() if is_sparse(problem) else problem
+        lines = np.array(sorted(self.xf + self.n_xf) + self.a, dtype=int) - 1
+        signs = [1 if i in self.xf else -1 for i in sorted(self.xf + self.n_xf)] + [1] * len(self.a)
+        matrix[lines, np.arange(self.num_var, self.num_columns - 1)] = signs
+        return matrix
+
+    def sensitivity(self):
+        if self.status != OPTIMAL:
+            raise Exception("Sensitivity analysis needs an optimal basis")
+        if self.presolve is not None:
+            raise Exception("Sensitivity analysis runs on the problem without presolve")
+        return Sensitivity(self)
+
+
+# Duals, reduced costs and ranging read off the optimal basis. Values are in
+# the problem's own sense (the change in z per unit of b or of the variable);
+# ranges are [lower, upper] over which the basis stays optimal. Lines dropped
+# as redundant by two-phase have a zero dual and can't move on their own.
+class Sensitivity:
+
+    def __init__(self, simplex):
+        first_artificial = simplex.first_artificial()
+        sign = 1 if simplex.fo_min else -1
+        names = simplex.variable_names()
+        self.variable_names = names[:first_artificial]
+        self.constraint_names = [f'r{i}' for i in range(1, simplex.num_rest + 1)]
+
+        b = dense_column(simplex.matrix_problem, -1)[1:]
+        cost = np.zeros(simplex.num_columns - 1)
+        objective = simplex.matrix_problem[[0], 1:-1]
+        cost[:simplex.num_var] = sign * (objective.toarray() if is_sparse(objective) else objective).ravel()
+        dropped = np.array(simplex.a, dtype=int)[simplex.dropped - first_artificial] - 1
+        kept = np.setdiff1d(np.arange(simplex.num_rest), dropped)
+        matrix = simplex.constraint_matrix()[kept]
+        basis = simplex.basis
+
+        lu = lu_factor(matrix[:, basis])
+        if simplex.revised is None:
+            tableau = simplex.get_algorithm()
+            body = tableau[1:, :first_artificial]
+            values = tableau[1:, -1]
+        else:
+            body = lu_solve(lu, matrix[:, :first_artificial])
+            values = simplex.revised.x_b
+        inverse = lu_solve(lu, np.eye(len(basis)))
+
+        # min-sense duals and reduced costs
+        y = lu_solve(lu, cost[basis], trans=1)
+        reduced_costs = cost[:first_artificial] - y @ matrix[:, :first_artificial]
+        nonbasic = simplex.nonbasic[:first_artificial]
+        reduced_costs[~nonbasic] = 0
+
+        self.duals = np.zeros(simplex.num_rest)
+        self.duals[kept] = sign * y + 0.0
+        self.reduced_costs = sign * reduced_costs + 0.0
+
+        # b + delta stays feasible while values + delta * inverse column >= 0
+        self.rhs = b
+        self.rhs_ranges = np.column_stack([b, b])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = -values[:, None] / inverse
+            lower = np.max(np.where(inverse > EPSILON, ratios, -np.inf), axis=0)
+            upper = np.min(np.where(inverse < -EPSILON, ratios, np.inf), axis=0)
+        self.rhs_ranges[kept, 0] += lower
+        self.rhs_ranges[kept, 1] += upper
+
+        # a basic cost moving by delta shifts the nonbasic reduced costs by
+        # -delta * its tableau line, a nonbasic one only its own
+        delta = np.column_stack([-reduced_costs, np.full(first_artificial, np.inf)])
+        delta[nonbasic & (reduced_costs < 0), 0] = 0
+        structural = basis < first_artificial
+        lines = body[structural][:, nonbasic]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = reduced_costs[nonbasic] / lines
+            # no nonbasic column (as many variables as equality lines) leaves
+            # every basic cost free
+            delta[basis[structural], 0] = np.max(np.where(lines < -EPSILON, ratios, -np.inf), axis=1,
+                                                 initial=-np.inf)
+            delta[basis[structural], 1] = np.min(np.where(lines > EPSILON, ratios, np.inf), axis=1, initial=np.inf)
+        delta = delta[:simplex.num_var]
+        if sign < 0:
+            delta = -delta[:, ::-1]
+        self.costs = sign * cost[:simplex.num_var]
+        self.cost_ranges = self.costs[:, None] + delta
+
+    def get_duals(self) -> dict:
+        return OrderedDict(zip(self.constraint_names, self.duals))
+
+    def get_reduced_costs(self) -> dict:
+        return OrderedDict(zip(self.variable_names, self.reduced_costs))
+
+
+# Minimum ratio over the positive column entries, -1 when the column has none
+# (unbounded direction). With a basis, ties go to the smallest basic variable
+# index as Bland's rule requires.
+def ratio_test(column, values, ratios=None, mask=None, basis=None) -> int:
+    if ratios is None:
+        ratios = np.empty(column.shape)
+        mask = np.empty(column.shape, dtype=bool)
+    np.greater(column, EPSILON, out=mask)
+    ratios.fill(np.inf)
+    np.divide(values, column, out=ratios, where=mask)
+    pivot_line_index = int(np.argmin(ratios))
+    if ratios[pivot_line_index] == np.inf:
+        return -1
+    if basis is not None:
+        ties = np.flatnonzero(ratios <= ratios[pivot_line_index] + EPSILON)
+        pivot_line_index = int(ties[np.argmin(basis[ties])])
+    return pivot_line_index
+
+
+# Dual simplex leaving line: the most negative basic value, or with bland
+# the infeasible line whose basic variable has the smallest index; -1 when
+# the basis is primal feasible
+def dual_pivot_line(values, basis, bland=False) -> int:
+    infeasible = values < -FEASIBILITY_TOLERANCE
+    if not np.any(infeasible):
+        return -1
+    if bland:
+        lines = np.flatnonzero(infeasible)
+        return int(lines[np.argmin(basis[lines])])
+    return int(np.argmin(values))
+
+
+# Dual simplex entering column: minimum |d_j / alpha_j| over the negative
+# entries of the pivot line, -1 when there is none (primal infeasible).
+# With bland, ties go to the smallest column, so together with
+# dual_pivot_line the dual simplex cannot cycle.
+def dual_ratio_test(line, reduced_costs, barred=None, bland=False) -> int:
+    candidates = line < -EPSILON
+    if barred is not None:
+        candidates[barred] = False
+    if not np.any(candidates):
+        return -1
+    ratios = np.full(line.shape, np.inf)
+    np.divide(reduced_costs, -line, out=ratios, where=candidates)
+    pivot_column_index = int(np.argmin(ratios))
+    if bland:
+        pivot_column_index = int(np.flatnonzero(ratios <= ratios[pivot_column_index] + EPSILON)[0])
+    return pivot_column_index
+
+
+# Pricing rules pick the entering column from minimization reduced costs
+# (negative entries improve the objective), -1 means the basis is optimal.
+# Rules with needs_line get the pivot line before every pivot to update their
+# reference weights, needs_cross also asks for a_j . B^-T (B^-1 a_q).
+class Pricing:
+    needs_line = False
+    needs_cross = False
+    bland = False
+
+    def reset(self, num_columns, column_norms=None) -> None:
+        pass
+
+    def select(self, reduced_costs) -> int:
+        raise NotImplementedError
+
+    def update(self, pivot_column_index, line, pivot, cross=None) -> None:
+        pass
+
+
+class DantzigPricing(Pricing):
+
+    def select(self, reduced_costs) -> int:
+        pivot_column_index = int(np.argmin(reduced_costs))
+        return pivot_column_index if reduced_costs[pivot_column_index] < -EPSILON else -1
+
+
+class BlandPricing(Pricing):
+    bland = True
+
+    def select(self, reduced_costs) -> int:
+        candidates = reduced_costs < -EPSILON
+        pivot_column_index = int(np.argmax(candidates))
+        return pivot_column_index if candidates[pivot_column_index] else -1
+
+
+class DevexPricing(Pricing):
+    needs_line = True
+
+    def __init__(self):
+        self.weights = None
+
+    def reset(self, num_columns, column_norms=None) -> None:
+        self.weights = np.ones(num_columns)
+
+    def select(self, reduced_costs) -> int:
+        candidates = reduced_costs < -EPSILON
+        if not np.any(candidates):
+            return -1
+        score = np.where(candidates, reduced_costs ** 2 / self.weights, -1)
+        return int(np.argmax(score))
+
+    def update(self, pivot_column_index, line, pivot, cross=None) -> None:
+        ratio = line / pivot
+        np.maximum(self.weights, ratio ** 2 * self.weights[pivot_column_index], out=self.weights)
+        self.weights[pivot_column_index] = 1
+
+
+# Goldfarb-Reid recurrence for the exact edge norms 1 + ||B^-1 a_j||^2
+class SteepestEdgePricing(DevexPricing):
+    needs_cross = True
+
+    def reset(self, num_columns, column_norms=None) -> None:
+        self.weights = np.array(column_norms, dtype=float)
+
+    def update(self, pivot_column_index, line, pivot, cross=None) -> None:
+        ratio = line / pivot
+        weight = self.weights[pivot_column_index]
+        self.weights += ratio * (ratio * weight - 2 * cross)
+        np.maximum(self.weights, 1 + ratio ** 2, out=self.weights)
+        self.weights[pivot_column_index] = 2
+
+
+PRICING_RULES = {
+    'dantzig': DantzigPricing,
+    'bland': BlandPricing,
+    'devex': DevexPricing,
+    'steepest_edge': SteepestEdgePricing,
+}
+
+
+def make_pricing(pricing) -> Pricing:
+    if isinstance(pricing, Pricing):
+        return pricing
+    if pricing not in PRICING_RULES:
+        raise Exception("Invalid pricing rule")
+    return PRICING_RULES[pricing]()
+
+
+# Hooks around a solve, all no-ops here. attach runs once from
+# Simplex.add_observer; phase_start/phase_end bracket each pivoting run
+# ('phase_one', 'phase_two' or 'dual') and iteration follows every pivot.
+class Observer:
+
+    def attach(self, simplex) -> None:
+        pass
+
+    def phase_start(self, simplex, phase) -> None:
+        pass
+
+    def iteration(self, simplex) -> None:
+        pass
+
+    def phase_end(self, simplex, phase, status) -> None:
+        pass
+
+
+# Work buffers are allocated once per tableau shape, so pricing, the ratio test
+# and the rank-1 pivot update (BLAS dger on the tableau memory) run without
+# per-iteration allocations
+class PivotKernel:
+
+    def __init__(self):
+        self.shape = None
+        self.column = None
+        self.line = None
+        self.costs = None
+        self.ratios = None
+        self.mask = None
+
+    def allocate(self, shape) -> None:
+        if self.shape == shape:
+            return
+        self.shape = shape
+        self.column = np.empty(shape[0])
+        self.line = np.empty(shape[1])
+        self.costs = np.empty(shape[1] - 1)
+        self.ratios = np.empty(shape[0] - 1)
+        self.mask = np.empty(shape[0] - 1, dtype=bool)
+
+    # objective line as minimization reduced costs: negative entries improve z
+    def reduced_costs(self, matrix, fo_min):
+        self.allocate(matrix.shape)
+        return np.multiply(matrix[0, :-1], -1.0 if fo_min else 1.0, out=self.costs)
+
+    def pivot_line(self, matrix, pivot_column_index, basis=None) -> int:
+        self.allocate(matrix.shape)
+        pivot_line_index = ratio_test(matrix[1:, pivot_column_index], matrix[1:, -1], self.ratios, self.mask, basis)
+        return pivot_line_index + 1 if pivot_line_index >= 0 else -1
+
+    def pivot(self, matrix, pivot_line_index, pivot_column_index) -> None:
+        self.allocate(matrix.shape)
+        np.copyto(self.column, matrix[:, pivot_column_index])
+        matrix[pivot_line_index] /= self.column[pivot_line_index]
+        self.column[pivot_line_index] = 0
+        np.copyto(self.line, matrix[pivot_line_index])
+        if matrix.flags.c_contiguous:
+            dger(-1.0, self.line, self.column, a=matrix.T, overwrite_a=1)
+        else:
+            matrix -= np.outer(self.column, self.line)
+
+
+# full    --> every tableau is kept
+# compact --> pivot log plus a snapshot every checkpoint_interval pivots, older
+#             tableaux are replayed from the nearest checkpoint on demand
+# none    --> only the current tableau is kept
+class History:
+
+    def __init__(self, mode='full', checkpoint_interval=10, cache_size=8):
+        if mode not in ('full', 'compact', 'none'):
+            raise Exception("Invalid history mode")
+        self.mode = mode
+        self.checkpoint_interval = checkpoint_interval
+        self.cache_size = cache_size
+        self.matrices = []
+        self.checkpoints = {}
+        self.pivots = []
+        self.bases = []
+        self.cache = OrderedDict()
+        self.kernel = PivotKernel()
+        self.current = None
+        self.current_basis = None
+        self.last_checkpoint = 0
+
+    def __len__(self) -> int:
+        return len(self.pivots)
+
+    def __getitem__(self, index):
+        index = self.normalize_index(index)
+        if self.mode == 'full':
+            return self.matrices[index]
+        if index == len(self) - 1:
+            return self.current
+        if self.mode == 'none':
+            raise IndexError("History disabled, only the current algorithm is available")
+        return self.rebuild(index)
+
+    def get_basis(self, index):
+        index = self.normalize_index(index)
+        if self.mode != 'none':
+            return self.bases[index]
+        if index == len(self) - 1:
+            return self.current_basis
+        raise IndexError("History disabled, only the current algorithm is available")
+
+    # (line, column) of the pivot that produced step index, None for steps
+    # that were not a single pivot
+    def get_pivot(self, index):
+        return self.pivots[self.normalize_index(index)]
+
+    def normalize_index(self, index) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Algorithm index out of range")
+        return index
+
+    # the matrix the next step may overwrite, copied only when an older step
+    # still references the current one
+    def next_matrix(self):
+        if self.mode == 'full' or (self.mode == 'compact' and self.last_checkpoint == len(self) - 1):
+            return np.copy(self.current)
+        return self.current
+
+    def append(self, matrix, basis) -> None:
+        self.store(matrix, basis, None, checkpoint=True)
+
+    def append_pivot(self, matrix, pivot_line_index, pivot_column_index, basis) -> None:
+        self.store(matrix, basis, (pivot_line_index, pivot_column_index),
+                   checkpoint=len(self) - self.last_checkpoint >= self.checkpoint_interval)
+
+    # bases are kept for every step (one int per line) unless history is off,
+    # then the current one is copied into the same buffer while the number
+    # of lines holds. The pivot goes in last, so a reader on another thread
+    # never sees a step counted before its matrix and basis are stored.
+    def store(self, matrix, basis, pivot, checkpoint) -> None:
+        self.current = matrix
+        if self.mode != 'none':
+            self.current_basis = np.copy(basis)
+            self.bases.append(self.current_basis)
+        elif self.current_basis is not None and self.current_basis.shape == basis.shape:
+            np.copyto(self.current_basis, basis)
+        else:
+            self.current_basis = np.copy(basis)
+        if self.mode == 'full':
+            self.matrices.append(matrix)
+        elif self.mode == 'compact' and checkpoint:
+            self.last_checkpoint = len(self)
+            self.checkpoints[self.last_checkpoint] = matrix
+        self.pivots.append(pivot)
+
+    # bytes held by stored matrices, bases and the replay cache; the current
+    # matrix counts once however many steps share it
+    def nbytes(self) -> int:
+        arrays = {id(matrix): matrix for matrix in self.matrices}
+        arrays.update((id(matrix), matrix) for matrix in self.checkpoints.values())
+        arrays.update((id(matrix), matrix) for matrix in self.cache.values())
+        if self.current is not None:
+            arrays[id(self.current)] = self.current
+        return sum(matrix.nbytes for matrix in arrays.values()) + sum(basis.nbytes for basis in self.bases)
+
+    def rebuild(self, index):
+        if index in self.checkpoints:
+            return self.checkpoints[index]
+        if index in self.cache:
+            self.cache.move_to_end(index)
+            return self.cache[index]
+        start = max(i for i in self.checkpoints if i <= index)
+        start = max([start] + [i for i in self.cache if start < i < index])
+        matrix = np.copy(self.checkpoints[start] if start in self.checkpoints else self.cache[start])
+        for pivot_line_index, pivot_column_index in self.pivots[start + 1:index + 1]:
+            self.kernel.pivot(matrix, pivot_line_index, pivot_column_index)
+        self.cache[index] = matrix
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return matrix
+
+
+# LU factors of a reference basis (dense LAPACK or sparse SuperLU) plus a
+# product-form eta file (one eta column per pivot); the caller refactorizes
+# once refactor_interval updates pile up
+class BasisFactor:
+
+    def __init__(self, basis_matrix, refactor_interval=50):
+        self.refactor_interval = refactor_interval
+        self.lu = None
+        self.sparse = False
+        self.etas = []
+        self.factorize(basis_matrix)
+
+    def factorize(self, basis_matrix) -> None:
+        self.sparse = is_sparse(basis_matrix)
+        self.lu = splu(basis_matrix.tocsc()) if self.sparse else lu_factor(basis_matrix)
+        self.etas = []
+
+    def solve(self, rhs, trans=False):
+        if self.sparse:
+            return self.lu.solve(np.ascontiguousarray(rhs, dtype=float), trans='T' if trans else 'N')
+        return lu_solve(self.lu, rhs, trans=1 if trans else 0)
+
+    def ftran(self, column):
+        x = self.solve(column)
+        for r, d in self.etas:
+            x_r = x[r] / d[r]
+            x -= d * x_r
+            x[r] = x_r
+        return x
+
+    def btran(self, line):
+        y = np.array(line, dtype=float)
+        for r, d in reversed(self.etas):
+            y[r] = (y[r] - (d @ y - d[r] * y[r])) / d[r]
+        return self.solve(y, trans=True)
+
+    def update(self, pivot_line_index, column) -> bool:
+        self.etas.append((pivot_line_index, np.copy(column)))
+        return len(self.etas) >= self.refactor_interval
+
+
+def is_sparse(matrix) -> bool:
+    return scipy.sparse.issparse(matrix)
+
+
+def dense_column(matrix, index):
+    if is_sparse(matrix):
+        return matrix[:, [index]].toarray().ravel()
+    return np.asarray(matrix[:, index], dtype=float)
+
+
+# Structural columns live in self.matrix (ndarray or CSC); slack, surplus and
+# artificial columns are implicit unit columns given by logical_rows and
+# logical_signs, so they are never stored.
+class RevisedSimplex:
+
+    def __init__(self, simplex, matrix_problem, sparse=False, refactor_interval=50):
+        self.simplex = simplex
+        self.refactor_interval = refactor_interval
+        self.sparse = sparse
+        num_var = simplex.num_var
+        num_slack = len(simplex.xf) + len(simplex.n_xf)
+        self.sign = 1 if simplex.fo_min else -1
+
+        if sparse:
+            matrix_problem = scipy.sparse.csc_matrix(matrix_problem, dtype=float)
+            objective = matrix_problem[0, :].toarray().ravel()
+            self.matrix = matrix_problem[1:, :-1].tocsc()
+            self.matrix.sort_indices()
+        else:
+            if is_sparse(matrix_problem):
+                matrix_problem = matrix_problem.toarray()
+            objective = np.asarray(matrix_problem[0, :], dtype=float)
+            self.matrix = np.array(matrix_problem[1:, :-1], dtype=float)
+        self.constant = objective[-1]
+        self.b = dense_column(matrix_problem, -1)[1:]
+        self.cost = np.zeros(simplex.num_columns - 1)
+        self.cost[:num_var] = self.sign * objective[:-1]
+        if len(simplex.a) > 0 and simplex.method == 'big_m':
+            simplex.a_value = max(x for x in objective[:-1]) * 10000
+            self.cost[num_var + num_slack:] = simplex.a_value
+        self.objective_cost = self.cost
+        self.barred = None
+
+        self.logical_rows = np.zeros(simplex.num_columns - 1 - num_var, dtype=int)
+        self.logical_signs = np.ones(simplex.num_columns - 1 - num_var)
+        self.basis = np.zeros(simplex.num_rest, dtype=int)
+        xf, n_xf, a = set(simplex.xf), set(simplex.n_xf), set(simplex.a)
+        control_column = [0, num_slack]
+        for i in range(1, simplex.num_lines):
+            if i in xf or i in n_xf:
+                self.logical_rows[control_column[0]] = i - 1
+                if i in xf:
+                    self.basis[i - 1] = num_var + control_column[0]
+                else:
+                    self.logical_signs[control_column[0]] = -1
+                control_column[0] += 1
+            if i in a:
+                self.logical_rows[control_column[1]] = i - 1
+                self.basis[i - 1] = num_var + control_column[1]
+                control_column[1] += 1
+
+        simplex.basis = self.basis
+        simplex.define_nonbasic(simplex.num_columns - 1)
+        self.factor = BasisFactor(self.basis_matrix(), refactor_interval)
+        self.x_b = self.factor.ftran(self.b)
+
+    def get_column(self, index):
+        column = np.zeros(self.simplex.num_rest)
+        if index >= self.simplex.num_var:
+            index -= self.simplex.num_var
+            column[self.logical_rows[index]] = self.logical_signs[index]
+        elif self.sparse:
+            start, end = self.matrix.indptr[index], self.matrix.indptr[index + 1]
+            column[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+        else:
+            column[:] = self.matrix[:, index]
+        return column
+
+    # A^T y over structural and logical columns
+    def transpose_product(self, line):
+        return np.concatenate([self.matrix.T @ line, self.logical_signs * line[self.logical_rows]])
+
+    def basis_matrix(self):
+        num_var = self.simplex.num_var
+        positions = np.arange(len(self.basis))
+        structural = self.basis < num_var
+        logical = self.basis[~structural] - num_var
+        if not self.sparse:
+            matrix = np.zeros([len(self.basis), len(self.basis)])
+            matrix[:, positions[structural]] = self.matrix[:, self.basis[structural]]
+            matrix[self.logical_rows[logical], positions[~structural]] = self.logical_signs[logical]
+            return matrix
+        block = self.matrix[:, self.basis[structural]].tocoo()
+        rows = np.concatenate([block.row, self.logical_rows[logical]])
+        columns = np.concatenate([positions[structural][block.col], positions[~structural]])
+        data = np.concatenate([block.data, self.logical_signs[logical]])
+        return scipy.sparse.csc_matrix((data, (rows, columns)), shape=(len(self.basis), len(self.basis)))
+
+    def full_matrix(self):
+        num_var = self.simplex.num_var
+        matrix = np.zeros([self.simplex.num_rest, self.simplex.num_columns - 1])
+        matrix[:, :num_var] = self.matrix.toarray() if self.sparse else self.matrix
+        matrix[self.logical_rows, np.arange(num_var, matrix.shape[1])] = self.logical_signs
+        return matrix
+
+    def refactor(self) -> None:
+        self.factor.factorize(self.basis_matrix())
+        self.x_b = self.factor.ftran(self.b)
+
+    def pricing_line(self):
+        y = self.factor.btran(self.cost[self.basis])
+        reduced_costs = self.cost - self.transpose_product(y)
+        reduced_costs[self.basis] = 0
+        if self.barred is not None:
+            reduced_costs[self.barred] = 0
+        return reduced_costs
+
+    def warm_start(self, basis, old_num_rest) -> None:
+        first_artificial = self.simplex.first_artificial()
+        self.basis[:] = np.concatenate([basis, self.basis[old_num_rest:]])
+        self.simplex.define_nonbasic(len(self.cost))
+        self.cost[first_artificial:] = 0
+        self.refactor()
+        flipped = np.flatnonzero((self.basis >= first_artificial) & (self.x_b > FEASIBILITY_TOLERANCE))
+        if len(flipped) > 0:
+            self.logical_signs[self.basis[flipped] - self.simplex.num_var] *= -1
+            self.refactor()
+        self.pivot_out_artificials(np.flatnonzero((self.basis >= first_artificial)
+                                                  & (np.abs(self.x_b) <= FEASIBILITY_TOLERANCE)))
+        self.barred = np.setdiff1d(np.arange(first_artificial, len(self.cost)), self.basis)
+
+    def primal_feasible(self) -> bool:
+        return bool(np.all(self.x_b >= -FEASIBILITY_TOLERANCE))
+
+    def shift_costs(self) -> bool:
+        reduced_costs = self.pricing_line()
+        shifted = reduced_costs < 0
+        self.cost = self.objective_cost.copy()
+        self.cost[shifted] -= reduced_costs[shifted]
+        return bool(np.any(shifted))
+
+    def restore_costs(self) -> None:
+        self.cost = self.objective_cost
+
+    def dual_iterate(self):
+        bland = self.simplex.pricing.bland
+        pivot_line_index = dual_pivot_line(self.x_b, self.basis, bland)
+        if pivot_line_index < 0:
+            return OPTIMAL
+        unit = np.zeros(self.simplex.num_rest)
+        unit[pivot_line_index] = 1
+        line = self.transpose_product(self.factor.btran(unit))
+        line[self.basis] = 0
+        reduced_costs = np.maximum(self.pricing_line(), 0)
+        pivot_column_index = dual_ratio_test(line, reduced_costs, self.barred, bland)
+        if pivot_column_index < 0:
+            return INFEASIBLE
+        column = self.factor.ftran(self.get_column(pivot_column_index))
+        degenerate = reduced_costs[pivot_column_index] <= EPSILON
+        self.pivot(pivot_line_index, pivot_column_index, column)
+        self.simplex.register_pivot(degenerate)
+        return None
+
+    def start_phase_one(self) -> None:
+        self.simplex.phase = 1
+        self.cost = np.zeros(len(self.objective_cost))
+        self.cost[self.simplex.first_artificial():] = 1
+
+    # artificials left basic at zero level are pivoted out where possible and
+    # no artificial may enter again
+    def start_phase_two(self) -> None:
+        first_artificial = self.simplex.first_artificial()
+        self.pivot_out_artificials(np.flatnonzero(self.basis >= first_artificial))
+        self.cost = self.objective_cost
+        self.barred = np.arange(first_artificial, len(self.cost))
+        self.simplex.phase = 2
+
+    def pivot_out_artificials(self, positions) -> None:
+        first_artificial = self.simplex.first_artificial()
+        for position in positions:
+            unit = np.zeros(self.simplex.num_rest)
+            unit[position] = 1
+            line = self.transpose_product(self.factor.btran(unit))[:first_artificial]
+            candidates = np.flatnonzero(np.abs(line) > EPSILON)
+            if len(candidates) > 0:
+                column = self.factor.ftran(self.get_column(candidates[0]))
+                self.pivot(position, candidates[0], column)
+
+    def reset_pricing(self) -> None:
+        pricing = self.simplex.pricing
+        column_norms = None
+        if pricing.needs_cross and np.all(self.basis >= self.simplex.num_var):
+            # a basis of signed unit columns (the starting slack/artificial
+            # one, say) leaves every column's norm as it is
+            column_norms = np.full(len(self.cost), 2.0)
+            if self.sparse:
+                column_norms[:self.simplex.num_var] = 1 + np.asarray(self.matrix.multiply(self.matrix).sum(axis=0))
+            else:
+                column_norms[:self.simplex.num_var] = 1 + np.sum(self.matrix ** 2, axis=0)
+        elif pricing.needs_cross:
+            # after phase one, a warm start or a crossover: 1 + ||B^-1 a_j||^2
+            column_norms = 1 + np.sum(self.get_tableau()[1:, :-1] ** 2, axis=0)
+        pricing.reset(len(self.cost), column_norms)
+
+    def iterate(self):
+        pricing = self.simplex.pricing
+        pivot_column_index = pricing.select(self.pricing_line())
+        if pivot_column_index < 0:
+            return self.simplex.final_status(self.x_b)
+        column = self.factor.ftran(self.get_column(pivot_column_index))
+        pivot_line_index = self.define_pivot_line(column)
+        if pivot_line_index < 0:
+            return UNBOUNDED
+        if pricing.needs_line:
+            unit = np.zeros(self.simplex.num_rest)
+            unit[pivot_line_index] = 1
+            line = self.transpose_product(self.factor.btran(unit))
+            cross = self.transpose_product(self.factor.btran(column)) if pricing.needs_cross else None
+            pricing.update(pivot_column_index, line, column[pivot_line_index], cross)
+        degenerate = self.x_b[pivot_line_index] <= EPSILON
+        self.pivot(pivot_line_index, pivot_column_index, column)
+        self.simplex.register_pivot(degenerate)
+        return None
+
+    def define_pivot_line(self, column) -> int:
+        return ratio_test(column, self.x_b, basis=self.basis if self.simplex.pricing.bland else None)
+
+    def pivot(self, pivot_line_index, pivot_column_index, column) -> None:
+        theta = self.x_b[pivot_line_index] / column[pivot_line_index]
+        self.x_b -= theta * column
+        self.x_b[pivot_line_index] = theta
+        self.simplex.swap_basis(pivot_line_index, pivot_column_index)
+        if self.factor.update(pivot_line_index, column):
+            self.refactor()
+
+    def get_tableau(self):
+        tableau = np.zeros([self.simplex.num_lines, self.simplex.num_columns])
+        basis_matrix = self.basis_matrix()
+        tableau[1:, :-1] = np.linalg.solve(basis_matrix.toarray() if self.sparse else basis_matrix,
+                                           self.full_matrix())
+        tableau[1:, -1] = self.x_b
+        tableau[0, :-1] = -self.sign * self.pricing_line() + 0.0
+        tableau[0, -1] = self.get_z()
+        return tableau
+
+    def get_vb(self) -> dict:
+        names = self.simplex.names
+        vb = {names[j]: self.x_b[i] for i, j in enumerate(self.basis)}
+        return OrderedDict(sorted(vb.items()))
+
+    def get_z(self) -> float:
+        return self.constant + self.sign * (self.cost[self.basis] @ self.x_b)
+
+
+# Solves a stack of same-shape problems (batch x lines x columns, one shared
+# config column) by pivoting every tableau in the stack at once. Each member
+# has its own pivot choice and leaves the working stack when it terminates.
+class BatchSimplex:
+
+    def __init__(self, matrix_problems, stall_limit=50):
+        matrix_problems = np.asarray(matrix_problems, dtype=float)
+        if matrix_problems.ndim != 3:
+            raise Exception("Batch must be a batch x lines x columns array")
+        if np.any(matrix_problems[:, :, 0] != matrix_problems[0, :, 0]):
+            raise Exception("All problems in a batch must share the config column")
+        self.layout = Simplex(matrix_problems[0], history='none')
+        self.stall_limit = stall_limit
+        self.batch = matrix_problems.shape[0]
+        self.fo_min = self.layout.fo_min
+        self.num_var = self.layout.num_var
+        self.num_rest = self.layout.num_rest
+
+        self.matrices = np.zeros([self.batch, self.layout.num_lines, self.layout.num_columns])
+        self.define_initial_algorithms(matrix_problems)
+        self.basis = np.tile(self.layout.basis, (self.batch, 1))
+        self.values = np.zeros([self.batch, self.num_rest])
+        self.z = np.zeros(self.batch)
+        self.status = np.full(self.batch, None, dtype=object)
+        self.iterations = np.zeros(self.batch, dtype=int)
+
+    def define_initial_algorithms(self, matrix_problems) -> None:
+        layout = self.layout
+        matrices = self.matrices
+        matrices[:, 1:, :self.num_var] = matrix_problems[:, 1:, 1:-1]
+        matrices[:, 1:, -1] = matrix_problems[:, 1:, -1]
+        matrices[:, 1:, self.num_var:-1] = layout.get_algorithm()[1:, self.num_var:-1]
+        objective = matrix_problems[:, 0, 1:-1]
+        if len(layout.a) == 0:
+            matrices[:, 0, :self.num_var] = -objective
+            matrices[:, 0, -1] = matrix_problems[:, 0, -1]
+            return
+        sign = 1 if self.fo_min else -1
+        a_value = objective.max(axis=1) * 10000
+        matrices[:, 0, :self.num_var] = objective
+        matrices[:, 0, -1] = matrix_problems[:, 0, -1]
+        matrices[:, 0, layout.num_columns - 1 - len(layout.a):-1] = (a_value * sign)[:, None]
+        matrices[:, 0] = sign * a_value[:, None] * matrices[:, layout.a].sum(axis=1) - matrices[:, 0]
+
+    def execute(self, max_iterations=None, time_limit=None):
+        start = time.perf_counter()
+        first_artificial = self.num_var + len(self.layout.xf) + len(self.layout.n_xf)
+        active = np.arange(self.batch)
+        matrices = self.matrices
+        basis = self.basis
+        degenerate_pivots = np.zeros(self.batch, dtype=int)
+        bland = np.zeros(self.batch, dtype=bool)
+        # a limit reached before the first pivot still slices these below
+        pivot_lines = np.zeros(self.batch, dtype=int)
+        pivot_columns = np.zeros(self.batch, dtype=int)
+        iterations = 0
+        while len(active) > 0:
+            if max_iterations is not None and iterations >= max_iterations:
+                status = np.full(len(active), BATCH_STATUS.index(ITERATION_LIMIT))
+            elif time_limit is not None and time.perf_counter() - start >= time_limit:
+                status = np.full(len(active), BATCH_STATUS.index(TIME_LIMIT))
+            else:
+                status, pivot_lines, pivot_columns = self.define_pivots(matrices, basis, bland, first_artificial)
+            done = status != 0
+            if np.any(done):
+                finished = active[done]
+                self.z[finished] = matrices[done, 0, -1]
+                self.values[finished] = matrices[done, 1:, -1]
+                self.basis[finished] = basis[done]
+                self.status[finished] = [BATCH_STATUS[s] for s in status[done]]
+                keep = ~done
+                active = active[keep]
+                matrices = matrices[keep]
+                basis = basis[keep]
+                degenerate_pivots = degenerate_pivots[keep]
+                bland = bland[keep]
+                pivot_lines = pivot_lines[keep]
+                pivot_columns = pivot_columns[keep]
+            if len(active) > 0:
+                self.pivot(matrices, basis, pivot_lines + 1, pivot_columns, degenerate_pivots, bland)
+                self.iterations[active] += 1
+                iterations += 1
+        self.matrices = None
+        return self.status
+
+    # status code per member (0 keeps pivoting) plus its pivot line and column
+    def define_pivots(self, matrices, basis, bland, first_artificial):
+        members = np.arange(len(matrices))
+        reduced_costs = matrices[:, 0, :-1] * (-1.0 if self.fo_min else 1.0)
+        candidates = reduced_costs < -EPSILON
+        pivot_columns = np.argmin(reduced_costs, axis=1)
+        if np.any(bland):
+            pivot_columns = np.where(bland, np.argmax(candidates, axis=1), pivot_columns)
+        optimal = ~candidates[members, pivot_columns]
+
+        columns = matrices[members, 1:, pivot_columns]
+        values = matrices[:, 1:, -1]
+        ratios = np.full(columns.shape, np.inf)
+        np.divide(values, columns, out=ratios, where=columns > EPSILON)
+        pivot_lines = np.argmin(ratios, axis=1)
+        minimum = ratios[members, pivot_lines]
+        if np.any(bland):
+            ties = ratios <= (minimum + EPSILON)[:, None]
+            bland_lines = np.argmin(np.where(ties, basis, np.iinfo(basis.dtype).max), axis=1)
+            pivot_lines = np.where(bland, bland_lines, pivot_lines)
+
+        status = np.zeros(len(matrices), dtype=int)
+        status[optimal] = BATCH_STATUS.index(OPTIMAL)
+        if len(self.layout.a) > 0:
+            artificial = np.any((basis >= first_artificial) & (values > FEASIBILITY_TOLERANCE), axis=1)
+            status[optimal & artificial] = BATCH_STATUS.index(INFEASIBLE)
+        status[~optimal & (minimum == np.inf)] = BATCH_STATUS.index(UNBOUNDED)
+        return status, pivot_lines, pivot_columns
+
+    def pivot(self, matrices, basis, pivot_lines, pivot_columns, degenerate_pivots, bland) -> None:
+        members = np.arange(len(matrices))
+        degenerate = matrices[members, pivot_lines, -1] <= EPSILON
+        degenerate_pivots[:] = np.where(degenerate, degenerate_pivots + 1, 0)
+        bland |= degenerate_pivots >= self.stall_limit
+        pivot_line = matrices[members, pivot_lines] / matrices[members, pivot_lines, pivot_columns][:, None]
+        column = matrices[members, :, pivot_columns]
+        column[members, pivot_lines] = 0
+        matrices -= column[:, :, None] * pivot_line[:, None, :]
+        matrices[members, pivot_lines] = pivot_line
+        basis[members, pivot_lines - 1] = pivot_columns
+
+    def get_vb(self, index) -> dict:
+        header = self.layout.get_header()
+        vb = {header[j]: self.values[index, i] for i, j in enumerate(self.basis[index])}
+        return OrderedDict(sorted(vb.items()))
+
+    def get_z(self, index) -> float:
+        return self.z[index]